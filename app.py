@@ -1,49 +1,594 @@
+import os
 import streamlit as st
+import numpy as np
 import pandas as pd
 import datetime
 import openpyxl
 from io import BytesIO
+from functools import partial
 from fpdf import FPDF
-import matplotlib.pyplot as plt
-import matplotlib as mpl
 import tax_engine
 
-# Set up a professional chart theme
-def set_chart_theme():
-    # Set the font family
-    plt.rcParams['font.family'] = 'sans-serif'
-    plt.rcParams['font.sans-serif'] = ['Arial', 'Helvetica', 'DejaVu Sans']
+# Import pyplot on first chart render and set up a professional chart theme.
+# rcParams are process-wide, so cache_resource applies them once, and sessions
+# that never draw a chart skip the matplotlib import altogether
+@st.cache_resource(show_spinner=False)
+def _pyplot():
+    import matplotlib.pyplot as plt
     
-    # Set the font sizes
-    plt.rcParams['font.size'] = 10
-    plt.rcParams['axes.titlesize'] = 14
-    plt.rcParams['axes.labelsize'] = 12
-    plt.rcParams['xtick.labelsize'] = 10
-    plt.rcParams['ytick.labelsize'] = 10
-    plt.rcParams['legend.fontsize'] = 10
+    plt.rcParams.update({
+        # Set the font family
+        'font.family': 'sans-serif',
+        'font.sans-serif': ['Arial', 'Helvetica', 'DejaVu Sans'],
+        
+        # Set the font sizes
+        'font.size': 10,
+        'axes.titlesize': 14,
+        'axes.labelsize': 12,
+        'xtick.labelsize': 10,
+        'ytick.labelsize': 10,
+        'legend.fontsize': 10,
+        
+        # Set the colors
+        'axes.prop_cycle': plt.cycler(color=['#4e79a7', '#f28e2c', '#59a14f', '#e15759', '#76b7b2', '#edc949', '#b07aa1', '#ff9da7']),
+        
+        # Set the grid style
+        'axes.grid': True,
+        'grid.alpha': 0.3,
+        'grid.linestyle': '--',
+        
+        # Set the figure size and DPI
+        'figure.figsize': (10, 6),
+        'figure.dpi': 100,
+        
+        # Set the background color
+        'figure.facecolor': '#f8f9fa',
+        'axes.facecolor': '#f8f9fa',
+        
+        # Set the spine visibility
+        'axes.spines.top': False,
+        'axes.spines.right': False,
+    })
+    return plt
+
+# Empty frames with the proper structure for the editable grids, built once.
+# The tax engine passes zero-row frames through unchanged, so they need no processing
+EMPTY_VESTING_DF = pd.DataFrame({
+    "Vesting Date": pd.Series(dtype='datetime64[ns]'),
+    "RSU Vested": pd.Series(dtype='float64'),
+    "FMV at Vesting": pd.Series(dtype='float64'),
+    "Marginal Tax Rate": pd.Series(dtype='float64'),
+    "Gross Value": pd.Series(dtype='float64'),
+    "Tax Payable": pd.Series(dtype='float64'),
+    "Net Value": pd.Series(dtype='float64')
+})
+
+EMPTY_SALES_DF = pd.DataFrame({
+    "Sell Date": pd.Series(dtype='datetime64[ns]'),
+    "Shares Sold": pd.Series(dtype='float64'),
+    "Sale Price": pd.Series(dtype='float64'),
+    "FMV at Vesting": pd.Series(dtype='float64'),
+    "Held > 12 Months": pd.Series(dtype='bool'),
+    "Marginal Tax Rate": pd.Series(dtype='float64'),
+    "Gross Value": pd.Series(dtype='float64'),
+    "Capital Gain": pd.Series(dtype='float64'),
+    "Tax on CG": pd.Series(dtype='float64'),
+    "Net Proceeds": pd.Series(dtype='float64')
+})
+
+# Row labels for the Tax Return Assistant income and tax tables
+INCOME_CATEGORIES = ("RSU Vesting Income", "Capital Gains", "CGT Discount Applied", "Net Capital Gain", "Total Taxable Income")
+TAX_CATEGORIES = ("Estimated Tax on Income", "Tax Already Withheld", "Remaining Tax Payable")
+
+# Cache Excel reads so reruns don't re-parse the same workbook
+# (openpyxl read-only mode streams rows instead of building the full workbook)
+EXCEL_READ_KWARGS = {"engine": "openpyxl", "engine_kwargs": {"read_only": True, "data_only": True, "keep_links": False}}
+
+@st.cache_data
+def _read_excel_bytes(data: bytes) -> pd.DataFrame:
+    return pd.read_excel(BytesIO(data), **EXCEL_READ_KWARGS)
+
+# Cache processed uploads so reruns that don't change the file or the tax
+# rate skip re-deriving Gross Value, tax and Financial Year
+@st.cache_data
+def _process_vesting_upload(data: bytes, tax_rate: int) -> pd.DataFrame:
+    return tax_engine.process_vesting_data(_read_excel_bytes(data), tax_rate)
+
+@st.cache_data
+def _process_sales_upload(data: bytes, tax_rate: int) -> pd.DataFrame:
+    return tax_engine.process_sales_data(_read_excel_bytes(data), tax_rate)
+
+# Cache the processed sample workbooks keyed on path, modification time and
+# tax rate, so repeat clicks skip both the openpyxl parse and the tax engine.
+# Kept in memory only: the key doesn't cover the tax engine's code, so a disk
+# cache would keep serving frames processed by an older engine after a deploy
+@st.cache_data(show_spinner=False)
+def _load_sample_vesting(path: str, mtime: float, tax_rate: int) -> pd.DataFrame:
+    return tax_engine.process_vesting_data(pd.read_excel(path, **EXCEL_READ_KWARGS), tax_rate)
+
+@st.cache_data(show_spinner=False)
+def _load_sample_sales(path: str, mtime: float, tax_rate: int) -> pd.DataFrame:
+    return tax_engine.process_sales_data(pd.read_excel(path, **EXCEL_READ_KWARGS), tax_rate)
+
+# Keep the processed upload in session state keyed on the upload's file_id and
+# the tax rate, so reruns with the same file skip even hashing its bytes
+def _session_upload(slot: str, uploaded_file, process, tax_rate: int) -> pd.DataFrame:
+    signature = (uploaded_file.file_id, tax_rate)
+    if st.session_state.get(f"{slot}_signature") != signature:
+        st.session_state[f"{slot}_df"] = process(uploaded_file.getvalue(), tax_rate)
+        st.session_state[f"{slot}_signature"] = signature
+    return st.session_state[f"{slot}_df"]
+
+# Report whether a data editor returned different contents than it was given.
+# The source's hash is kept alongside the frame itself in session state, so each
+# rerun only hashes the editor output instead of comparing every cell
+def _editor_changed(slot: str, source: pd.DataFrame, edited: pd.DataFrame) -> bool:
+    if edited is None:
+        return False
+    cached = st.session_state.get(f"{slot}_hash")
+    if cached is None or cached[0] is not source:
+        cached = (source, int(pd.util.hash_pandas_object(source, index=False).sum()))
+        st.session_state[f"{slot}_hash"] = cached
+    if len(edited) != len(source) or not edited.columns.equals(source.columns):
+        return True
+    return int(pd.util.hash_pandas_object(edited, index=False).sum()) != cached[1]
+
+# Financial-year totals, cached on the frame's contents so reruns triggered by
+# unrelated widgets reuse the aggregate for the tables, charts and PDF export
+@st.cache_data(show_spinner=False)
+def _summarize_fy(df: pd.DataFrame, columns: tuple) -> pd.DataFrame:
+    return tax_engine.summarize_by_financial_year(df, list(columns))
+
+# Column totals in a single pass over the stacked columns, cached on the frame's
+# contents so the Summary tab only re-reduces when the data changes
+@st.cache_data(show_spinner=False)
+def _column_totals(df: pd.DataFrame, columns: tuple) -> tuple:
+    return tuple(np.nansum(df[list(columns)].to_numpy(dtype=np.float64), axis=0).tolist())
+
+# Display labelled dollar totals as metrics in a single row
+def _metric_row(metrics: dict) -> None:
+    for col, (label, value) in zip(st.columns(len(metrics)), metrics.items()):
+        col.metric(label, f"${value:,.2f}")
+
+# Per-year totals of the tax summary inputs, aggregated once per data set so
+# switching the selected financial year doesn't rescan the frames
+@st.cache_data(show_spinner=False)
+def _tax_year_totals(schedule: pd.DataFrame, sell_data: pd.DataFrame) -> tuple:
+    return tax_engine.summarize_tax_years(schedule, sell_data)
+
+# Tax summary for one financial year, cached on the data and year so widget
+# interactions in the Tax Return Assistant (checklist ticks etc.) skip the engine
+@st.cache_data(show_spinner=False)
+def _fy_tax_summary(schedule: pd.DataFrame, sell_data: pd.DataFrame, year: str) -> tax_engine.FinancialYearTaxSummary:
+    return tax_engine.generate_financial_year_summary(
+        schedule,
+        sell_data,
+        year,
+        other_income=0.0,
+        has_private_health=False,
+        family=False,
+        has_help_debt=False,
+        year_totals=_tax_year_totals(schedule, sell_data)
+    )
+
+# Serialize a DataFrame to xlsx bytes (xlsxwriter emits the XML in a single pass),
+# cached on the frame's contents so repeat downloads of unchanged data reuse the bytes
+@st.cache_data(show_spinner=False)
+def _to_excel_bytes(df: pd.DataFrame, sheet_name: str) -> bytes:
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+    return buffer.getvalue()
+
+# Build the tax summary workbook (income, tax and ATO item sheets) on demand for
+# its download button, so no workbook buffer is held between reruns
+def _tax_summary_excel(income_df: pd.DataFrame, tax_df: pd.DataFrame, ato_items: dict) -> bytes:
+    tax_buffer = BytesIO()
+    with pd.ExcelWriter(tax_buffer, engine='xlsxwriter') as writer:
+        # Income sheet
+        income_df.to_excel(writer, index=False, sheet_name="Income Summary")
+        
+        # Tax sheet
+        tax_df.to_excel(writer, index=False, sheet_name="Tax Summary")
+        
+        # ATO Items sheet
+        ato_df = pd.DataFrame({
+            "Item Code": list(ato_items.keys()),
+            "Amount": list(ato_items.values())
+        })
+        ato_df.to_excel(writer, index=False, sheet_name="ATO Items")
+    return tax_buffer.getvalue()
+
+# Fresh single-page document in the body font shared by every export. Core
+# font metrics are module-level in fpdf, so building one is cheaper than
+# deep-copying a cached template
+def _new_pdf() -> FPDF:
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    return pdf
+
+# Get a finished PDF as bytes without an extra BytesIO copy
+# (fpdf returns a latin-1 str, fpdf2 returns a bytearray)
+def _pdf_bytes(pdf: FPDF) -> bytes:
+    output = pdf.output(dest='S')
+    return output.encode('latin1') if isinstance(output, str) else bytes(output)
+
+# PDF builders for the export buttons. They are handed to st.download_button as
+# callables, so the document is only assembled when the user clicks download,
+# on a separate thread from the script rerun
+def _summary_pdf(company: str, vesting_totals, sales_totals, cg_by_fy) -> bytes:
+    pdf = _new_pdf()
+    pdf.cell(200, 10, txt="RSU Management Summary", ln=True, align="C")
+    pdf.ln(10)
+    pdf.cell(200, 10, txt=f"Company: {company}", ln=True)
+    
+    # Add Financial Year-wise Capital Gain Summary to PDF if available
+    if cg_by_fy is not None and not cg_by_fy.empty:
+        pdf.ln(5)
+        pdf.cell(200, 10, txt="Financial Year-wise Capital Gain Summary:", ln=True)
+        pdf.multi_cell(0, 10, txt="\n".join(
+            f"FY {fy}: Capital Gain ${gain:,.2f}, Tax ${tax:,.2f}, Net ${net:,.2f}"
+            for fy, gain, tax, net in zip(cg_by_fy["Financial Year"], cg_by_fy["Capital Gain"],
+                                          cg_by_fy["Tax on CG"], cg_by_fy["Net Proceeds"])
+        ))
+    
+    # Emit each group of totals as one text block instead of a cell() call per line
+    total_gain, total_cgt_tax, total_net_sale = sales_totals
+    if vesting_totals is not None:
+        total_gross, total_tax, total_net = vesting_totals
+        pdf.multi_cell(0, 10, txt=(
+            f"Total Gross Value: ${total_gross:,.2f}\n"
+            f"Total Tax Payable: ${total_tax:,.2f}\n"
+            f"Total Net Value: ${total_net:,.2f}"
+        ))
+        pdf.ln(5)
+    pdf.multi_cell(0, 10, txt=(
+        "Capital Gains Summary:\n"
+        f"Total Capital Gains: ${total_gain:,.2f}\n"
+        f"Tax on Capital Gains: ${total_cgt_tax:,.2f}\n"
+        f"Net Proceeds: ${total_net_sale:,.2f}"
+    ))
+    
+    return _pdf_bytes(pdf)
+
+def _ato_pdf(selected_year: str, company: str, tax_residency: str, ato_nonzero: dict) -> bytes:
+    pdf = _new_pdf()
+    pdf.cell(200, 10, txt=f"Tax Return Summary - {selected_year}", ln=True, align="C")
+    pdf.ln(10)
+    
+    # Company and personal info
+    pdf.cell(200, 10, txt=f"Company: {company}", ln=True)
+    pdf.cell(200, 10, txt=f"Tax Residency: {tax_residency}", ln=True)
+    pdf.ln(5)
+    
+    # ATO Items
+    pdf.set_font("Arial", 'B', size=12)
+    pdf.cell(200, 10, txt="ATO Tax Return Items:", ln=True)
+    pdf.set_font("Arial", size=12)
+    
+    # Written as one text block
+    if ato_nonzero:
+        pdf.multi_cell(0, 10, txt="\n".join(f"{code}: ${amount:,.2f}" for code, amount in ato_nonzero.items()))
+    
+    return _pdf_bytes(pdf)
+
+def _checklist_pdf(selected_year: str, documents: list) -> bytes:
+    pdf = _new_pdf()
+    pdf.cell(200, 10, txt="RSU Tax Documentation Checklist", ln=True, align="C")
+    pdf.ln(10)
+    
+    # Checklist items
+    pdf.set_font("Arial", 'B', size=12)
+    pdf.cell(200, 10, txt="Required Documents:", ln=True)
+    pdf.set_font("Arial", size=12)
+    
+    for doc in documents:
+        pdf.cell(200, 10, txt=f"[ ] {doc}", ln=True)
+    
+    pdf.ln(5)
+    pdf.cell(200, 10, txt="Notes:", ln=True)
+    pdf.ln(20)  # Space for notes
+    
+    # Tax deadlines
+    pdf.set_font("Arial", 'B', size=12)
+    pdf.cell(200, 10, txt="Important Tax Deadlines:", ln=True)
+    pdf.set_font("Arial", size=12)
+    pdf.cell(200, 10, txt=f"- Individual Tax Return Due: 31 October {selected_year.split('-')[1]}", ln=True)
+    
+    return _pdf_bytes(pdf)
+
+# Rasterize a finished figure to PNG bytes and release it. The chart renderers
+# below are cached on the plotted values so reruns that don't touch the
+# underlying data skip matplotlib entirely
+def _figure_png(fig) -> bytes:
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=200)
+    _pyplot().close(fig)
+    return buffer.getvalue()
+
+# Render the Capital Gain/Loss chart to PNG bytes
+@st.cache_data
+def _render_capital_gain_chart(financial_years: tuple, gains: tuple) -> bytes:
+    plt = _pyplot()
+    fig, ax = plt.subplots()
+    bars = ax.bar(financial_years, gains,
+                  color=['#59a14f' if x >= 0 else '#e15759' for x in gains])
+    ax.set_xlabel('Financial Year')
+    ax.set_ylabel('Capital Gain/Loss ($)')
+    ax.set_title('Capital Gain/Loss by Financial Year', fontweight='bold')
+    
+    # Add value labels on top of bars
+    for bar in bars:
+        height = bar.get_height()
+        if height >= 0:
+            ax.text(bar.get_x() + bar.get_width()/2., height + (0.01 * abs(height)),
+                    f'${height:,.2f}', ha='center', va='bottom', fontsize=9)
+        else:
+            ax.text(bar.get_x() + bar.get_width()/2., height - (0.01 * abs(height)),
+                    f'${height:,.2f}', ha='center', va='top', fontsize=9)
+    
+    # Adjust layout
+    plt.tight_layout()
+    
+    return _figure_png(fig)
+
+# Render the vesting value bars (gross/tax/net per financial year) to PNG bytes
+@st.cache_data
+def _render_vesting_value_chart(financial_years: tuple, gross: tuple, tax: tuple, net: tuple) -> bytes:
+    plt = _pyplot()
+    fig, ax = plt.subplots()
+    
+    # Set width of bars
+    barWidth = 0.25
+    
+    # Set position of bars on X axis
+    r1 = range(len(financial_years))
+    r2 = [x + barWidth for x in r1]
+    r3 = [x + barWidth for x in r2]
+    
+    # Create bars with theme colors
+    ax.bar(r1, gross, width=barWidth, label='Gross Value', color='#4e79a7')
+    ax.bar(r2, tax, width=barWidth, label='Tax Payable', color='#e15759')
+    ax.bar(r3, net, width=barWidth, label='Net Value', color='#59a14f')
+    
+    # Add labels and title
+    ax.set_xlabel('Financial Year')
+    ax.set_ylabel('Amount ($)')
+    ax.set_title('RSU Vesting Schedule by Financial Year', fontweight='bold')
+    ax.set_xticks([r + barWidth for r in range(len(financial_years))])
+    ax.set_xticklabels(financial_years)
+    
+    # Add value labels on top of bars
+    for i, (g, t, n) in enumerate(zip(gross, tax, net)):
+        ax.text(i, g + 0.1, f"${g:,.2f}", ha='center', fontsize=9)
+        ax.text(i + barWidth, t + 0.1, f"${t:,.2f}", ha='center', fontsize=9)
+        ax.text(i + 2*barWidth, n + 0.1, f"${n:,.2f}", ha='center', fontsize=9)
+    
+    # Add legend with better positioning
+    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=3)
+    
+    # Adjust layout to make room for legend
+    plt.tight_layout(rect=[0, 0.05, 1, 0.95])
     
-    # Set the colors
-    plt.rcParams['axes.prop_cycle'] = plt.cycler(color=['#4e79a7', '#f28e2c', '#59a14f', '#e15759', '#76b7b2', '#edc949', '#b07aa1', '#ff9da7'])
+    return _figure_png(fig)
+
+# Render the RSUs vested per financial year chart to PNG bytes
+@st.cache_data
+def _render_rsus_vested_chart(financial_years: tuple, rsus: tuple) -> bytes:
+    plt = _pyplot()
+    fig, ax = plt.subplots()
+    bars = ax.bar(financial_years, rsus, color='#b07aa1')
+    ax.set_xlabel('Financial Year')
+    ax.set_ylabel('Number of RSUs')
+    ax.set_title('Total RSUs Vested by Financial Year', fontweight='bold')
+    
+    # Add value labels on top of bars
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                f'{height:,.0f}', ha='center', va='bottom', fontsize=9)
+    
+    # Adjust layout
+    plt.tight_layout()
+    
+    return _figure_png(fig)
+
+# Render the vest price vs sale price chart to PNG bytes
+# (date_labels are pre-formatted strings, '' for missing dates)
+@st.cache_data
+def _render_stock_performance_chart(date_labels: tuple, vest_prices: tuple, sale_prices: tuple) -> bytes:
+    plt = _pyplot()
+    fig, ax = plt.subplots()
+    
+    # Set width of bars
+    barWidth = 0.4
+    
+    # Set position of bars on X axis
+    r1 = range(len(date_labels))
+    r2 = [x + barWidth for x in r1]
+    
+    # Create bars
+    ax.bar(r1, vest_prices, width=barWidth, label='FMV at Vesting', color='#4e79a7')
+    ax.bar(r2, sale_prices, width=barWidth, label='Sale Price', color='#f28e2c')
     
-    # Set the grid style
-    plt.rcParams['axes.grid'] = True
-    plt.rcParams['grid.alpha'] = 0.3
-    plt.rcParams['grid.linestyle'] = '--'
+    # Add labels and title
+    ax.set_xlabel('Sale Date')
+    ax.set_ylabel('Price ($)')
+    ax.set_title('Stock Performance: Vest Price vs Sale Price', fontweight='bold')
+    ax.set_xticks([r + barWidth/2 for r in range(len(date_labels))])
+    ax.set_xticklabels(date_labels, rotation=45)
     
-    # Set the figure size and DPI
-    plt.rcParams['figure.figsize'] = (10, 6)
-    plt.rcParams['figure.dpi'] = 100
+    # Add value labels on top of bars
+    for i, (vest, sale) in enumerate(zip(vest_prices, sale_prices)):
+        if pd.notnull(vest):
+            ax.text(i, vest + 0.1, f"${vest:,.2f}", ha='center', va='bottom', fontsize=9)
+        if pd.notnull(sale):
+            ax.text(i + barWidth, sale + 0.1, f"${sale:,.2f}", ha='center', va='bottom', fontsize=9)
     
-    # Set the background color
-    plt.rcParams['figure.facecolor'] = '#f8f9fa'
-    plt.rcParams['axes.facecolor'] = '#f8f9fa'
+    # Add legend with better positioning
+    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=2)
     
-    # Set the spine visibility
-    plt.rcParams['axes.spines.top'] = False
-    plt.rcParams['axes.spines.right'] = False
+    # Adjust layout to make room for legend and rotated x-labels
+    plt.tight_layout(rect=[0, 0.1, 1, 0.95])
+    
+    return _figure_png(fig)
 
-# Apply the chart theme
-set_chart_theme()
+# Render the capital gains vs tax per financial year chart to PNG bytes
+@st.cache_data
+def _render_gains_vs_tax_chart(financial_years: tuple, gains: tuple, taxes: tuple) -> bytes:
+    plt = _pyplot()
+    fig, ax = plt.subplots()
+    
+    # Set width of bars
+    barWidth = 0.35
+    
+    # Set position of bars on X axis
+    r1 = range(len(financial_years))
+    r2 = [x + barWidth for x in r1]
+    
+    # Create bars with theme colors
+    ax.bar(r1, gains, width=barWidth, label='Capital Gain', color='#4e79a7')
+    ax.bar(r2, taxes, width=barWidth, label='Tax on CG', color='#e15759')
+    
+    # Add labels and title
+    ax.set_xlabel('Financial Year')
+    ax.set_ylabel('Amount ($)')
+    ax.set_title('Capital Gains vs Tax by Financial Year', fontweight='bold')
+    ax.set_xticks([r + barWidth/2 for r in range(len(financial_years))])
+    ax.set_xticklabels(financial_years)
+    
+    # Add value labels on top of bars
+    for i, (gain, tax) in enumerate(zip(gains, taxes)):
+        if pd.notnull(gain):
+            ax.text(i, gain + 0.1, f"${gain:,.2f}", ha='center', fontsize=9)
+        if pd.notnull(tax):
+            ax.text(i + barWidth, tax + 0.1, f"${tax:,.2f}", ha='center', fontsize=9)
+    
+    # Add legend with better positioning
+    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=2)
+    
+    # Adjust layout to make room for legend
+    plt.tight_layout(rect=[0, 0.05, 1, 0.95])
+    
+    return _figure_png(fig)
+
+# Render the editable sales grid, visualizations, export and clear controls
+# for processed sales data (shared by the session and fresh-upload paths)
+def _render_sales_tab(sell_data: pd.DataFrame, tax_rate: int, editor_key: str) -> None:
+    # No "Add New Sales Entry" button - users can add rows directly in the data editor
+    
+    # Display formatted data (editable)
+    edited_sell_data = st.data_editor(
+        sell_data,
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        key=editor_key,
+        column_config={
+            "Capital Gain": st.column_config.NumberColumn(format="dollar"),
+            "Tax on CG": st.column_config.NumberColumn(format="dollar"),
+            "Net Proceeds": st.column_config.NumberColumn(format="dollar"),
+            "Marginal Tax Rate": st.column_config.NumberColumn(format="%.1f%%"),
+            "Sell Date": st.column_config.DateColumn(
+                "Sell Date",
+                help="Date when RSUs were sold",
+                format="YYYY-MM-DD",
+                step=1,
+            ),
+            "Held > 12 Months": st.column_config.CheckboxColumn(
+                "Held > 12 Months",
+                help="Check if shares were held for more than 12 months (for CGT discount)",
+            ),
+        }
+    )
+    
+    # Process the edited data only if it has changed
+    if _editor_changed("sales_editor", sell_data, edited_sell_data):
+        # Process the edited data with tax engine
+        processed_sell_data = tax_engine.process_sales_data(edited_sell_data, tax_rate)
+        st.session_state["sales_data"] = processed_sell_data
+        
+        # Force rerun to update the UI immediately with recalculated values
+        st.rerun()
+    
+    # Create visualizations
+    if not sell_data.empty and len(sell_data) > 0:
+        st.markdown("### 📊 Visualizations")
+        
+        # Total gains and tax per financial year once for both FY charts
+        if "Financial Year" in sell_data.columns:
+            fy_data = _summarize_fy(sell_data, ("Capital Gain", "Tax on CG"))
+        
+        # Create tabs for different visualizations
+        viz_tab1, viz_tab2, viz_tab3 = st.tabs([
+            "Capital Gain/Loss by Financial Year",
+            "Stock Performance",
+            "Capital Gains vs Tax"
+        ])
+        
+        with viz_tab1:
+            # New visualization - Capital Gain/Loss by Financial Year
+            if "Financial Year" in sell_data.columns:
+                # Check if we have valid data for the chart
+                if not fy_data.empty and len(fy_data) > 0:
+                    st.image(_render_capital_gain_chart(
+                        tuple(fy_data['Financial Year']), tuple(fy_data['Capital Gain'])
+                    ))
+                else:
+                    st.info("Not enough data to generate capital gain chart. Please add more sales data.")
+            else:
+                st.info("Financial Year data not available. Please ensure your data includes dates.")
+        
+        with viz_tab2:
+            # Create a DataFrame for comparison
+            # (process_sales_data has already parsed Sell Date to datetime64)
+            performance_df = pd.DataFrame({
+                'Date': sell_data['Sell Date'],
+                'Vest Price': sell_data['FMV at Vesting'],
+                'Sale Price': sell_data['Sale Price']
+            }).sort_values('Date')
+            
+            # Check if we have valid data for the chart
+            if not performance_df.empty and len(performance_df) > 0 and pd.notnull(performance_df['Date']).any():
+                # New visualization - Stock Performance as bar chart
+                date_labels = performance_df['Date'].dt.strftime('%Y-%m-%d').fillna('')
+                st.image(_render_stock_performance_chart(
+                    tuple(date_labels), tuple(performance_df['Vest Price']), tuple(performance_df['Sale Price'])
+                ))
+            else:
+                st.info("Not enough data to generate stock performance chart. Please add sales data with valid dates.")
+        
+        with viz_tab3:
+            # New visualization - Capital Gains vs Tax by Financial Year
+            if "Financial Year" in sell_data.columns:
+                # Check if we have valid data for the chart
+                if not fy_data.empty and len(fy_data) > 0:
+                    st.image(_render_gains_vs_tax_chart(
+                        tuple(fy_data['Financial Year']), tuple(fy_data['Capital Gain']), tuple(fy_data['Tax on CG'])
+                    ))
+                else:
+                    st.info("Not enough data to generate capital gains vs tax chart. Please add more sales data.")
+            else:
+                st.info("Financial Year data not available. Please ensure your data includes dates.")
+    
+    # Export to Excel
+    # Build the workbook only when the user actually clicks download
+    rsu_sales_buffer = partial(_to_excel_bytes, sell_data, "RSU Sales")
+    
+    st.download_button("📥 Download RSU Sales (Excel)",
+                      data=rsu_sales_buffer,
+                      file_name="rsu_sales.xlsx",
+                      mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    
+    # Add button to clear all data
+    if st.button("🗑️ Clear All Sales Data"):
+        if st.session_state.get("confirm_clear_sales", False):
+            st.session_state["sales_data"] = EMPTY_SALES_DF.copy()
+            st.rerun()
+        else:
+            st.session_state["confirm_clear_sales"] = True
+            st.warning("Click again to confirm clearing all sales data.")
 
 st.set_page_config(page_title="RSU Manager", layout="wide")
 st.title("📊 RSU Management Dashboard")
@@ -60,28 +605,14 @@ tax_residency = "Australian Resident"  # Default value
 if st.sidebar.button("📂 Load Sample Data"):
     st.session_state["load_sample"] = True
     
-    # Load vesting data
-    vesting_data = pd.read_excel("sample_rsu_data.xlsx")
-    
-    # Print original data for debugging
-    print("Original vesting data:")
-    print(vesting_data)
-    print("Columns:", vesting_data.columns.tolist())
-    
-    # Process vesting data with tax engine
-    vesting_data = tax_engine.process_vesting_data(vesting_data, tax_rate)
-    
-    # Print processed data for debugging
-    print("Processed vesting data:")
-    print(vesting_data)
-    print("Columns:", vesting_data.columns.tolist())
-    
+    # Load vesting data and process it with tax engine
+    vesting_path = "sample_rsu_data.xlsx"
+    vesting_data = _load_sample_vesting(vesting_path, os.path.getmtime(vesting_path), tax_rate)
     st.session_state["vesting_data"] = vesting_data
     
-    # Load sales data
-    sales_data = pd.read_excel("sample_rsu_sales.xlsx")
-    # Process sales data with tax engine
-    sales_data = tax_engine.process_sales_data(sales_data, tax_rate)
+    # Load sales data and process it with tax engine
+    sales_path = "sample_rsu_sales.xlsx"
+    sales_data = _load_sample_sales(sales_path, os.path.getmtime(sales_path), tax_rate)
     st.session_state["sales_data"] = sales_data
     
     st.sidebar.success("Sample data loaded successfully!")
@@ -104,1041 +635,418 @@ st.sidebar.markdown("""
 st.sidebar.markdown("Support this tool's development and maintenance!")
 
 
-# Tabs
+# Resolve the active vesting and sales data up front: the Summary and Tax Return
+# tabs read them even on reruns where the tabs that own them are not rendered.
+# Both stay None until data is loaded, uploaded or entered
+schedule = None
+sell_data = None
+
+if "vesting_data" in st.session_state:
+    schedule = st.session_state["vesting_data"]
+elif vesting_file:
+    # Process vesting data using tax engine (cached per upload and tax rate)
+    schedule = _session_upload("vesting_upload", vesting_file, _process_vesting_upload, tax_rate)
+
+if "sales_data" in st.session_state:
+    sell_data = st.session_state["sales_data"]
+elif sales_file:
+    # Process sales data (cached per upload and tax rate)
+    sell_data = _session_upload("sales_upload", sales_file, _process_sales_upload, tax_rate)
+
+# Workaround, not dead code: with lazy tabs the checklist checkboxes (doc_*
+# keys) aren't rendered while another tab is open, and Streamlit clears the
+# session state of widgets that weren't rendered in a run. Re-assigning each
+# key turns it into plain session state that survives the run, so the ticks
+# are still there when the Tax Return tab is opened again
+for checklist_key in [key for key in st.session_state if str(key).startswith("doc_")]:
+    st.session_state[checklist_key] = st.session_state[checklist_key]
+
+# Tabs. Switching tabs reruns the script and only the selected tab's body
+# executes, so charts, summaries and exports are built only where they're seen
 tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "📆 Vesting Schedule",
     "💸 RSU Sell Tracker",
     "📊 Summary",
     "📝 Tax Return Assistant",
     "💡 Optimization"
-])
+], key="active_tab", on_change="rerun")
 
 # -------- TAB 1: VESTING --------
 with tab1:
-    if "vesting_data" in st.session_state:
-        schedule = st.session_state["vesting_data"]
-        
-        # Display vesting schedule (editable)
-        st.subheader(f"Vesting Schedule for {company}")
+    if tab1.open:
+        if "vesting_data" in st.session_state:
+            # Display vesting schedule (editable)
+            st.subheader(f"Vesting Schedule for {company}")
         
-        # Make the dataframe editable
-        edited_schedule = st.data_editor(
-            schedule.style.format({
-                "Gross Value": "${:,.2f}",
-                "Tax Payable": "${:,.2f}",
-                "Net Value": "${:,.2f}",
-                "Marginal Tax Rate": "{:.1f}%"
-            }),
-            num_rows="dynamic",
-            use_container_width=True,
-            hide_index=True,
-            key="vesting_data_editor",
-            column_config={
-                "Vesting Date": st.column_config.DateColumn(
-                    "Vesting Date",
-                    help="Date when RSUs vested",
-                    format="YYYY-MM-DD",
-                    step=1,
-                ),
-            }
-        )
+            # Make the dataframe editable
+            edited_schedule = st.data_editor(
+                schedule,
+                num_rows="dynamic",
+                use_container_width=True,
+                hide_index=True,
+                key="vesting_data_editor",
+                column_config={
+                    "Gross Value": st.column_config.NumberColumn(format="dollar"),
+                    "Tax Payable": st.column_config.NumberColumn(format="dollar"),
+                    "Net Value": st.column_config.NumberColumn(format="dollar"),
+                    "Marginal Tax Rate": st.column_config.NumberColumn(format="%.1f%%"),
+                    "Vesting Date": st.column_config.DateColumn(
+                        "Vesting Date",
+                        help="Date when RSUs vested",
+                        format="YYYY-MM-DD",
+                        step=1,
+                    ),
+                }
+            )
         
-        # Process the edited data only if it has changed
-        if edited_schedule is not None and not edited_schedule.equals(schedule):
-            # Process the edited data with tax engine
-            processed_schedule = tax_engine.process_vesting_data(edited_schedule, tax_rate)
-            st.session_state["vesting_data"] = processed_schedule
-            schedule = processed_schedule
+            # Process the edited data only if it has changed
+            if _editor_changed("vesting_editor", schedule, edited_schedule):
+                # Process the edited data with tax engine
+                processed_schedule = tax_engine.process_vesting_data(edited_schedule, tax_rate)
+                st.session_state["vesting_data"] = processed_schedule
+                schedule = processed_schedule
             
-            # Force rerun to update the UI immediately with recalculated values
-            st.rerun()
+                # Force rerun to update the UI immediately with recalculated values
+                st.rerun()
         
-        # Create visualization for total vest schedule by year
-        if not schedule.empty and "Financial Year" in schedule.columns:
-            st.markdown("### 📊 Vesting Schedule Visualization")
+            # Create visualization for total vest schedule by year
+            if not schedule.empty and "Financial Year" in schedule.columns:
+                st.markdown("### 📊 Vesting Schedule Visualization")
             
-            # Group by Financial Year
-            fy_vesting = schedule.groupby("Financial Year")[["RSU Vested", "Gross Value", "Tax Payable", "Net Value"]].sum().reset_index()
+                # Group by Financial Year
+                fy_vesting = _summarize_fy(schedule, ("RSU Vested", "Gross Value", "Tax Payable", "Net Value"))
             
-            # Only create charts if we have enough data
-            if not fy_vesting.empty and len(fy_vesting) > 0:
                 # Only create charts if we have enough data
-                if not fy_vesting.empty and len(fy_vesting) > 0:
-                    # Create bar chart
-                    fig, ax = plt.subplots()
-                    
-                    # Set width of bars
-                    barWidth = 0.25
-                    
-                    # Set position of bars on X axis
-                    r1 = range(len(fy_vesting))
-                    r2 = [x + barWidth for x in r1]
-                    r3 = [x + barWidth for x in r2]
-                    
-                    # Create bars with theme colors
-                    ax.bar(r1, fy_vesting['Gross Value'], width=barWidth, label='Gross Value', color='#4e79a7')
-                    ax.bar(r2, fy_vesting['Tax Payable'], width=barWidth, label='Tax Payable', color='#e15759')
-                    ax.bar(r3, fy_vesting['Net Value'], width=barWidth, label='Net Value', color='#59a14f')
-                    
-                    # Add labels and title
-                    ax.set_xlabel('Financial Year')
-                    ax.set_ylabel('Amount ($)')
-                    ax.set_title('RSU Vesting Schedule by Financial Year', fontweight='bold')
-                    ax.set_xticks([r + barWidth for r in range(len(fy_vesting))])
-                    ax.set_xticklabels(fy_vesting['Financial Year'])
-                    
-                    # Add value labels on top of bars
-                    for i, v in enumerate(fy_vesting['Gross Value']):
-                        ax.text(i, v + 0.1, f"${v:,.2f}", ha='center', fontsize=9)
-                    
-                    for i, v in enumerate(fy_vesting['Tax Payable']):
-                        ax.text(i + barWidth, v + 0.1, f"${v:,.2f}", ha='center', fontsize=9)
-                        
-                    for i, v in enumerate(fy_vesting['Net Value']):
-                        ax.text(i + 2*barWidth, v + 0.1, f"${v:,.2f}", ha='center', fontsize=9)
-                    
-                    # Add legend with better positioning
-                    ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=3)
-                    
-                    # Adjust layout to make room for legend
-                    plt.tight_layout(rect=[0, 0.05, 1, 0.95])
-                    
-                    st.pyplot(fig)
-                    
+                if not fy_vesting.empty:
+                    st.image(_render_vesting_value_chart(
+                        tuple(fy_vesting['Financial Year']), tuple(fy_vesting['Gross Value']),
+                        tuple(fy_vesting['Tax Payable']), tuple(fy_vesting['Net Value'])
+                    ))
+                
                     # Add a second chart for RSUs vested by year
                     st.markdown("### 📈 RSUs Vested by Year")
-                    fig2, ax2 = plt.subplots()
-                    bars = ax2.bar(fy_vesting['Financial Year'], fy_vesting['RSU Vested'], color='#b07aa1')
-                    ax2.set_xlabel('Financial Year')
-                    ax2.set_ylabel('Number of RSUs')
-                    ax2.set_title('Total RSUs Vested by Financial Year', fontweight='bold')
-                    
-                    # Add value labels on top of bars
-                    for bar in bars:
-                        height = bar.get_height()
-                        ax2.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                                f'{height:,.0f}', ha='center', va='bottom', fontsize=9)
-                    
-                    # Adjust layout
-                    plt.tight_layout()
-                    
-                    st.pyplot(fig2)
+                    st.image(_render_rsus_vested_chart(
+                        tuple(fy_vesting['Financial Year']), tuple(fy_vesting['RSU Vested'])
+                    ))
                 else:
                     st.info("Not enough data to generate charts. Please add more vesting data with dates.")
         
-        # Export to Excel
-        
-        # Export to Excel
-        vesting_buffer = BytesIO()
-        with pd.ExcelWriter(vesting_buffer, engine='openpyxl') as writer:
-            schedule.to_excel(writer, index=False, sheet_name="Vesting Schedule")
-        vesting_buffer.seek(0)
+            # Export to Excel
+            # Build the workbook only when the user actually clicks download
+            vesting_buffer = partial(_to_excel_bytes, schedule, "Vesting Schedule")
         
-        st.download_button("📥 Download Vesting Schedule (Excel)",
-                          data=vesting_buffer,
-                          file_name="vesting_schedule.xlsx",
-                          mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            st.download_button("📥 Download Vesting Schedule (Excel)",
+                              data=vesting_buffer,
+                              file_name="vesting_schedule.xlsx",
+                              mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
         
-        # Add button to clear all data
-        if st.button("🗑️ Clear All Vesting Data"):
-            if st.session_state.get("confirm_clear_vesting", False):
-                # Create an empty DataFrame with the proper structure
-                empty_vesting_df = pd.DataFrame({
-                    "Vesting Date": pd.Series(dtype='datetime64[ns]'),
-                    "RSU Vested": pd.Series(dtype='float64'),
-                    "FMV at Vesting": pd.Series(dtype='float64'),
-                    "Marginal Tax Rate": pd.Series(dtype='float64'),
-                    "Gross Value": pd.Series(dtype='float64'),
-                    "Tax Payable": pd.Series(dtype='float64'),
-                    "Net Value": pd.Series(dtype='float64')
-                })
-                # Process the empty DataFrame to ensure it has all required columns
-                empty_vesting_df = tax_engine.process_vesting_data(empty_vesting_df, tax_rate)
-                st.session_state["vesting_data"] = empty_vesting_df
-                st.rerun()
-            else:
-                st.session_state["confirm_clear_vesting"] = True
-                st.warning("Click again to confirm clearing all vesting data.")
-    elif vesting_file:
-        schedule = pd.read_excel(vesting_file)
-        # Process vesting data using tax engine
-        schedule = tax_engine.process_vesting_data(schedule, tax_rate)
-        
-        # Display vesting schedule
-        st.subheader(f"Vesting Schedule for {company}")
-        st.dataframe(schedule.style.format({
-            "Gross Value": "${:,.2f}",
-            "Tax Payable": "${:,.2f}",
-            "Net Value": "${:,.2f}"
-        }))
-        
-        # Export to Excel
-        vesting_buffer = BytesIO()
-        with pd.ExcelWriter(vesting_buffer, engine='openpyxl') as writer:
-            schedule.to_excel(writer, index=False, sheet_name="Vesting Schedule")
-        vesting_buffer.seek(0)
-        
-        st.download_button("📥 Download Vesting Schedule (Excel)",
-                          data=vesting_buffer,
-                          file_name="vesting_schedule.xlsx",
-                          mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-    else:
-        # Create an empty DataFrame with the necessary columns for vesting data
-        # Create an empty DataFrame with the necessary columns for vesting data
-        # Initialize with proper data types, especially for date columns
-        empty_vesting_df = pd.DataFrame({
-            "Vesting Date": pd.Series(dtype='datetime64[ns]'),
-            "RSU Vested": pd.Series(dtype='float64'),
-            "FMV at Vesting": pd.Series(dtype='float64'),
-            "Marginal Tax Rate": pd.Series(dtype='float64'),
-            "Gross Value": pd.Series(dtype='float64'),
-            "Tax Payable": pd.Series(dtype='float64'),
-            "Net Value": pd.Series(dtype='float64')
-        })
+            # Add button to clear all data
+            if st.button("🗑️ Clear All Vesting Data"):
+                if st.session_state.get("confirm_clear_vesting", False):
+                    st.session_state["vesting_data"] = EMPTY_VESTING_DF.copy()
+                    st.rerun()
+                else:
+                    st.session_state["confirm_clear_vesting"] = True
+                    st.warning("Click again to confirm clearing all vesting data.")
+        elif vesting_file:
+            # Display vesting schedule
+            st.subheader(f"Vesting Schedule for {company}")
+            st.dataframe(schedule, column_config={
+                "Gross Value": st.column_config.NumberColumn(format="dollar"),
+                "Tax Payable": st.column_config.NumberColumn(format="dollar"),
+                "Net Value": st.column_config.NumberColumn(format="dollar")
+            })
         
-        # Process the empty DataFrame to ensure it has all required columns
-        empty_vesting_df = tax_engine.process_vesting_data(empty_vesting_df, tax_rate)
+            # Export to Excel
+            # Build the workbook only when the user actually clicks download
+            vesting_buffer = partial(_to_excel_bytes, schedule, "Vesting Schedule")
         
-        # Display an editable data grid even when no data is available
-        st.info("No vesting data available. You can add entries directly in the grid below.")
+            st.download_button("📥 Download Vesting Schedule (Excel)",
+                              data=vesting_buffer,
+                              file_name="vesting_schedule.xlsx",
+                              mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        else:
+            # Display an editable data grid even when no data is available
+            st.info("No vesting data available. You can add entries directly in the grid below.")
         
-        # Display formatted data (editable)
-        edited_schedule = st.data_editor(
-            empty_vesting_df.style.format({
-                "Gross Value": "${:,.2f}",
-                "Tax Payable": "${:,.2f}",
-                "Net Value": "${:,.2f}",
-                "Marginal Tax Rate": "{:.1f}%"
-            }),
-            num_rows="dynamic",
-            use_container_width=True,
-            hide_index=True,
-            key="vesting_data_editor_empty",
-            column_config={
-                "Vesting Date": st.column_config.DateColumn(
-                    "Vesting Date",
-                    help="Date when RSUs vested",
-                    format="YYYY-MM-DD",
-                    step=1,
-                ),
-            }
-        )
+            # Display formatted data (editable)
+            edited_schedule = st.data_editor(
+                EMPTY_VESTING_DF,
+                num_rows="dynamic",
+                use_container_width=True,
+                hide_index=True,
+                key="vesting_data_editor_empty",
+                column_config={
+                    "Gross Value": st.column_config.NumberColumn(format="dollar"),
+                    "Tax Payable": st.column_config.NumberColumn(format="dollar"),
+                    "Net Value": st.column_config.NumberColumn(format="dollar"),
+                    "Marginal Tax Rate": st.column_config.NumberColumn(format="%.1f%%"),
+                    "Vesting Date": st.column_config.DateColumn(
+                        "Vesting Date",
+                        help="Date when RSUs vested",
+                        format="YYYY-MM-DD",
+                        step=1,
+                    ),
+                }
+            )
         
-        # Process the edited data only if it has changed and is not empty
-        if edited_schedule is not None and not edited_schedule.empty and not edited_schedule.equals(empty_vesting_df):
-            # Process the edited data with tax engine
-            processed_schedule = tax_engine.process_vesting_data(edited_schedule, tax_rate)
-            st.session_state["vesting_data"] = processed_schedule
+            # Process the edited data only if it has changed and is not empty
+            # (an empty grid can only gain rows, which the editor's own state records)
+            if edited_schedule is not None and st.session_state["vesting_data_editor_empty"]["added_rows"]:
+                # Process the edited data with tax engine
+                processed_schedule = tax_engine.process_vesting_data(edited_schedule, tax_rate)
+                st.session_state["vesting_data"] = processed_schedule
             
-            # Force rerun to update the UI immediately with recalculated values
-            st.rerun()
+                # Force rerun to update the UI immediately with recalculated values
+                st.rerun()
 
 # This section has been moved into the conditional blocks above
 
 # -------- TAB 2: SALES --------
 with tab2:
-    st.subheader("💸 RSU Sell Tracker & Capital Gains")
+    if tab2.open:
+        st.subheader("💸 RSU Sell Tracker & Capital Gains")
 
-    if "sales_data" in st.session_state:
-        sell_data = st.session_state["sales_data"]
-        
-        # Process data
-        sell_data = tax_engine.process_sales_data(sell_data, tax_rate)
-        
-        # No "Add New Sales Entry" button - users can add rows directly in the data editor
-        
-        # Display formatted data (editable)
-        edited_sell_data = st.data_editor(
-            sell_data.style.format({
-                "Capital Gain": "${:,.2f}",
-                "Tax on CG": "${:,.2f}",
-                "Net Proceeds": "${:,.2f}",
-                "Marginal Tax Rate": "{:.1f}%"
-            }),
-            num_rows="dynamic",
-            use_container_width=True,
-            hide_index=True,
-            key="sales_data_editor_upload",  # Add a unique key for this data editor
-            column_config={
-                "Sell Date": st.column_config.DateColumn(
-                    "Sell Date",
-                    help="Date when RSUs were sold",
-                    format="YYYY-MM-DD",
-                    step=1,
-                ),
-                "Held > 12 Months": st.column_config.CheckboxColumn(
-                    "Held > 12 Months",
-                    help="Check if shares were held for more than 12 months (for CGT discount)",
-                ),
-            }
-        )
-        
-        # Process the edited data only if it has changed
-        if edited_sell_data is not None and not edited_sell_data.equals(sell_data):
-            # Process the edited data with tax engine
-            processed_sell_data = tax_engine.process_sales_data(edited_sell_data, tax_rate)
-            st.session_state["sales_data"] = processed_sell_data
-            sell_data = processed_sell_data
-            
-            # Force rerun to update the UI immediately with recalculated values
-            st.rerun()
-        
-        # Create visualizations
-        if not sell_data.empty and len(sell_data) > 0:
-            st.markdown("### 📊 Visualizations")
-            
-            # Create tabs for different visualizations
-            viz_tab1, viz_tab2, viz_tab3 = st.tabs([
-                "Capital Gain/Loss by Financial Year",
-                "Stock Performance",
-                "Capital Gains vs Tax"
-            ])
-            
-            with viz_tab1:
-                # New visualization - Capital Gain/Loss by Financial Year
-                if "Financial Year" in sell_data.columns:
-                    # Group by Financial Year
-                    fy_data = sell_data.groupby("Financial Year")["Capital Gain"].sum().reset_index()
-                    
-                    # Check if we have valid data for the chart
-                    if not fy_data.empty and len(fy_data) > 0:
-                        # Create bar chart
-                        fig2, ax2 = plt.subplots()
-                        bars = ax2.bar(fy_data['Financial Year'], fy_data['Capital Gain'],
-                                      color=['#59a14f' if x >= 0 else '#e15759' for x in fy_data['Capital Gain']])
-                        ax2.set_xlabel('Financial Year')
-                        ax2.set_ylabel('Capital Gain/Loss ($)')
-                        ax2.set_title('Capital Gain/Loss by Financial Year', fontweight='bold')
-                        
-                        # Add value labels on top of bars
-                        for bar in bars:
-                            height = bar.get_height()
-                            value = height if height >= 0 else height
-                            if height >= 0:
-                                ax2.text(bar.get_x() + bar.get_width()/2., height + (0.01 * abs(height)),
-                                        f'${value:,.2f}', ha='center', va='bottom', fontsize=9)
-                            else:
-                                ax2.text(bar.get_x() + bar.get_width()/2., height - (0.01 * abs(height)),
-                                        f'${value:,.2f}', ha='center', va='top', fontsize=9)
-                        
-                        # Adjust layout
-                        plt.tight_layout()
-                        
-                        st.pyplot(fig2)
-                    else:
-                        st.info("Not enough data to generate capital gain chart. Please add more sales data.")
-                else:
-                    st.info("Financial Year data not available. Please ensure your data includes dates.")
-            
-            with viz_tab2:
-                # Create a DataFrame for comparison
-                performance_df = pd.DataFrame({
-                    'Date': sell_data['Sell Date'],
-                    'Vest Price': sell_data['FMV at Vesting'],
-                    'Sale Price': sell_data['Sale Price']
-                }).sort_values('Date')
-                
-                # Check if we have valid data for the chart
-                if not performance_df.empty and len(performance_df) > 0 and pd.notnull(performance_df['Date']).any():
-                    # New visualization - Stock Performance as bar chart
-                    fig3, ax3 = plt.subplots()
-                    
-                    # Set width of bars
-                    barWidth = 0.4
-                    
-                    # Set position of bars on X axis
-                    r1 = range(len(performance_df))
-                    r2 = [x + barWidth for x in r1]
-                    
-                    # Create bars
-                    ax3.bar(r1, performance_df['Vest Price'], width=barWidth, label='FMV at Vesting', color='#4e79a7')
-                    ax3.bar(r2, performance_df['Sale Price'], width=barWidth, label='Sale Price', color='#f28e2c')
-                    
-                    # Add labels and title
-                    ax3.set_xlabel('Sale Date')
-                    ax3.set_ylabel('Price ($)')
-                    ax3.set_title('Stock Performance: Vest Price vs Sale Price', fontweight='bold')
-                    ax3.set_xticks([r + barWidth/2 for r in range(len(performance_df))])
-                    
-                    # Format dates safely
-                    date_labels = []
-                    for d in performance_df['Date']:
-                        try:
-                            if pd.notnull(d):
-                                date_labels.append(d.strftime('%Y-%m-%d'))
-                            else:
-                                date_labels.append('')
-                        except:
-                            date_labels.append('')
-                    
-                    ax3.set_xticklabels(date_labels, rotation=45)
-                    
-                    # Add value labels on top of bars
-                    for i, v in enumerate(performance_df['Vest Price']):
-                        if pd.notnull(v):
-                            ax3.text(i, v + 0.1, f"${v:,.2f}", ha='center', va='bottom', fontsize=9)
-                    
-                    for i, v in enumerate(performance_df['Sale Price']):
-                        if pd.notnull(v):
-                            ax3.text(i + barWidth, v + 0.1, f"${v:,.2f}", ha='center', va='bottom', fontsize=9)
-                    
-                    # Add legend with better positioning
-                    ax3.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=2)
-                    
-                    # Adjust layout to make room for legend and rotated x-labels
-                    plt.tight_layout(rect=[0, 0.1, 1, 0.95])
-                    
-                    st.pyplot(fig3)
-                else:
-                    st.info("Not enough data to generate stock performance chart. Please add sales data with valid dates.")
-            
-            with viz_tab3:
-                # New visualization - Capital Gains vs Tax by Financial Year
-                if "Financial Year" in sell_data.columns:
-                    # Group by Financial Year
-                    fy_data = sell_data.groupby("Financial Year")[["Capital Gain", "Tax on CG"]].sum().reset_index()
-                    
-                    # Check if we have valid data for the chart
-                    if not fy_data.empty and len(fy_data) > 0:
-                        # Create bar chart
-                        fig4, ax4 = plt.subplots()
-                        
-                        # Set width of bars
-                        barWidth = 0.35
-                        
-                        # Set position of bars on X axis
-                        r1 = range(len(fy_data))
-                        r2 = [x + barWidth for x in r1]
-                        
-                        # Create bars with theme colors
-                        ax4.bar(r1, fy_data['Capital Gain'], width=barWidth, label='Capital Gain', color='#4e79a7')
-                        ax4.bar(r2, fy_data['Tax on CG'], width=barWidth, label='Tax on CG', color='#e15759')
-                        
-                        # Add labels and title
-                        ax4.set_xlabel('Financial Year')
-                        ax4.set_ylabel('Amount ($)')
-                        ax4.set_title('Capital Gains vs Tax by Financial Year', fontweight='bold')
-                        ax4.set_xticks([r + barWidth/2 for r in range(len(fy_data))])
-                        ax4.set_xticklabels(fy_data['Financial Year'])
-                        
-                        # Add value labels on top of bars
-                        for i, v in enumerate(fy_data['Capital Gain']):
-                            if pd.notnull(v):
-                                ax4.text(i, v + 0.1, f"${v:,.2f}", ha='center', fontsize=9)
-                        
-                        for i, v in enumerate(fy_data['Tax on CG']):
-                            if pd.notnull(v):
-                                ax4.text(i + barWidth, v + 0.1, f"${v:,.2f}", ha='center', fontsize=9)
-                        
-                        # Add legend with better positioning
-                        ax4.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=2)
-                        
-                        # Adjust layout to make room for legend
-                        plt.tight_layout(rect=[0, 0.05, 1, 0.95])
-                        
-                        st.pyplot(fig4)
-                    else:
-                        st.info("Not enough data to generate capital gains vs tax chart. Please add more sales data.")
-                else:
-                    st.info("Financial Year data not available. Please ensure your data includes dates.")
-        
-        # Export to Excel
-        rsu_sales_buffer = BytesIO()
-        with pd.ExcelWriter(rsu_sales_buffer, engine='openpyxl') as writer:
-            sell_data.to_excel(writer, index=False, sheet_name="RSU Sales")
-        rsu_sales_buffer.seek(0)
-        
-        st.download_button("📥 Download RSU Sales (Excel)",
-                          data=rsu_sales_buffer,
-                          file_name="rsu_sales.xlsx",
-                          mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        
-        # Add button to clear all data
-        if st.button("🗑️ Clear All Sales Data"):
-            if st.session_state.get("confirm_clear_sales", False):
-                # Create an empty DataFrame with the proper structure
-                empty_sales_df = pd.DataFrame({
-                    "Sell Date": pd.Series(dtype='datetime64[ns]'),
-                    "Shares Sold": pd.Series(dtype='float64'),
-                    "Sale Price": pd.Series(dtype='float64'),
-                    "FMV at Vesting": pd.Series(dtype='float64'),
-                    "Held > 12 Months": pd.Series(dtype='bool'),
-                    "Marginal Tax Rate": pd.Series(dtype='float64'),
-                    "Gross Value": pd.Series(dtype='float64'),
-                    "Capital Gain": pd.Series(dtype='float64'),
-                    "Tax on CG": pd.Series(dtype='float64'),
-                    "Net Proceeds": pd.Series(dtype='float64')
-                })
-                # Process the empty DataFrame to ensure it has all required columns
-                empty_sales_df = tax_engine.process_sales_data(empty_sales_df, tax_rate)
-                st.session_state["sales_data"] = empty_sales_df
-                st.rerun()
-            else:
-                st.session_state["confirm_clear_sales"] = True
-                st.warning("Click again to confirm clearing all sales data.")
-    elif sales_file:
-        sell_data = pd.read_excel(sales_file)
-        
-        # Process sales data
-        sell_data = tax_engine.process_sales_data(sell_data, tax_rate)
-        
-        # No "Add New Sales Entry" button - users can add rows directly in the data editor
-        
-        # Display formatted data (editable)
-        edited_sell_data = st.data_editor(
-            sell_data.style.format({
-                "Capital Gain": "${:,.2f}",
-                "Tax on CG": "${:,.2f}",
-                "Net Proceeds": "${:,.2f}",
-                "Marginal Tax Rate": "{:.1f}%"
-            }),
-            num_rows="dynamic",
-            use_container_width=True,
-            hide_index=True,
-            key="sales_data_editor",  # Add a key for the data editor
-            column_config={
-                "Sell Date": st.column_config.DateColumn(
-                    "Sell Date",
-                    help="Date when RSUs were sold",
-                    format="YYYY-MM-DD",
-                    step=1,
-                ),
-                "Held > 12 Months": st.column_config.CheckboxColumn(
-                    "Held > 12 Months",
-                    help="Check if shares were held for more than 12 months (for CGT discount)",
-                ),
-            }
-        )
+        if "sales_data" in st.session_state:
+            _render_sales_tab(sell_data, tax_rate, "sales_data_editor_upload")
+        elif sales_file:
+            _render_sales_tab(sell_data, tax_rate, "sales_data_editor")
+        else:
+            # Display an editable data grid even when no data is available
+            st.info("No sales data available. You can add entries directly in the grid below.")
         
-        # Process the edited data only if it has changed
-        if edited_sell_data is not None and not edited_sell_data.equals(sell_data):
-            # Process the edited data with tax engine
-            processed_sell_data = tax_engine.process_sales_data(edited_sell_data, tax_rate)
-            st.session_state["sales_data"] = processed_sell_data
-            sell_data = processed_sell_data
-            
-            # Force rerun to update the UI immediately with recalculated values
-            st.rerun()
+            # Display formatted data (editable)
+            edited_sell_data = st.data_editor(
+                EMPTY_SALES_DF,
+                num_rows="dynamic",
+                use_container_width=True,
+                hide_index=True,
+                key="sales_data_editor_empty",
+                column_config={
+                    "Capital Gain": st.column_config.NumberColumn(format="dollar"),
+                    "Tax on CG": st.column_config.NumberColumn(format="dollar"),
+                    "Net Proceeds": st.column_config.NumberColumn(format="dollar"),
+                    "Marginal Tax Rate": st.column_config.NumberColumn(format="%.1f%%"),
+                    "Sell Date": st.column_config.DateColumn(
+                        "Sell Date",
+                        help="Date when RSUs were sold",
+                        format="YYYY-MM-DD",
+                        step=1,
+                    ),
+                    "Held > 12 Months": st.column_config.CheckboxColumn(
+                        "Held > 12 Months",
+                        help="Check if shares were held for more than 12 months (for CGT discount)",
+                    ),
+                }
+            )
         
-        # Create visualizations
-        if not sell_data.empty and len(sell_data) > 0:
-            st.markdown("### 📊 Visualizations")
-            
-            # Create tabs for different visualizations
-            viz_tab1, viz_tab2, viz_tab3 = st.tabs([
-                "Capital Gain/Loss by Financial Year",
-                "Stock Performance",
-                "Capital Gains vs Tax"
-            ])
-            
-            with viz_tab2:
-                # New visualization - Capital Gain/Loss by Financial Year
-                if "Financial Year" in sell_data.columns:
-                    # Group by Financial Year
-                    fy_data = sell_data.groupby("Financial Year")["Capital Gain"].sum().reset_index()
-                    
-                    # Create bar chart
-                    fig2, ax2 = plt.subplots(figsize=(10, 6))
-                    bars = ax2.bar(fy_data['Financial Year'], fy_data['Capital Gain'], color=['green' if x >= 0 else 'red' for x in fy_data['Capital Gain']])
-                    ax2.set_xlabel('Financial Year')
-                    ax2.set_ylabel('Capital Gain/Loss ($)')
-                    ax2.set_title('Capital Gain/Loss by Financial Year')
-                    
-                    # Add value labels on top of bars
-                    for bar in bars:
-                        height = bar.get_height()
-                        value = height if height >= 0 else height
-                        ax2.text(bar.get_x() + bar.get_width()/2., height + (0.01 * abs(height)),
-                                f'${value:,.2f}', ha='center', va='bottom', rotation=0)
-                    
-                    st.pyplot(fig2)
-                else:
-                    st.info("Financial Year data not available. Please ensure your data includes dates.")
+            # Process the edited data only if it has changed and is not empty
+            # (an empty grid can only gain rows, which the editor's own state records)
+            if edited_sell_data is not None and st.session_state["sales_data_editor_empty"]["added_rows"]:
+                # Process the edited data with tax engine
+                processed_sell_data = tax_engine.process_sales_data(edited_sell_data, tax_rate)
+                st.session_state["sales_data"] = processed_sell_data
             
-            with viz_tab2:
-                # New visualization - Stock Performance as bar chart
-                fig3, ax3 = plt.subplots()
-                
-                # Create a DataFrame for comparison
-                performance_df = pd.DataFrame({
-                    'Date': sell_data['Sell Date'],
-                    'Vest Price': sell_data['FMV at Vesting'],
-                    'Sale Price': sell_data['Sale Price']
-                }).sort_values('Date')
-                
-                # Set width of bars
-                barWidth = 0.4
-                
-                # Set position of bars on X axis
-                r1 = range(len(performance_df))
-                r2 = [x + barWidth for x in r1]
-                
-                # Create bars
-                ax3.bar(r1, performance_df['Vest Price'], width=barWidth, label='FMV at Vesting', color='#4e79a7')
-                ax3.bar(r2, performance_df['Sale Price'], width=barWidth, label='Sale Price', color='#f28e2c')
-                
-                # Add labels and title
-                ax3.set_xlabel('Sale Date')
-                ax3.set_ylabel('Price ($)')
-                ax3.set_title('Stock Performance: Vest Price vs Sale Price', fontweight='bold')
-                ax3.set_xticks([r + barWidth/2 for r in range(len(performance_df))])
-                ax3.set_xticklabels([d.strftime('%Y-%m-%d') for d in performance_df['Date']], rotation=45)
-                
-                # Add value labels on top of bars
-                for i, v in enumerate(performance_df['Vest Price']):
-                    ax3.text(i, v + 0.1, f"${v:,.2f}", ha='center', va='bottom', fontsize=9)
-                
-                for i, v in enumerate(performance_df['Sale Price']):
-                    ax3.text(i + barWidth, v + 0.1, f"${v:,.2f}", ha='center', va='bottom', fontsize=9)
-                
-                # Add legend with better positioning
-                ax3.legend(loc='upper center', bbox_to_anchor=(0.5, -0.15), ncol=2)
-                
-                # Adjust layout to make room for legend and rotated x-labels
-                plt.tight_layout(rect=[0, 0.1, 1, 0.95])
-                
-                st.pyplot(fig3)
-            
-            with viz_tab3:
-                # New visualization - Capital Gains vs Tax by Financial Year
-                if "Financial Year" in sell_data.columns:
-                    # Group by Financial Year
-                    fy_data = sell_data.groupby("Financial Year")[["Capital Gain", "Tax on CG"]].sum().reset_index()
-                    
-                    # Create bar chart
-                    fig4, ax4 = plt.subplots(figsize=(10, 6))
-                    
-                    # Set width of bars
-                    barWidth = 0.35
-                    
-                    # Set position of bars on X axis
-                    r1 = range(len(fy_data))
-                    r2 = [x + barWidth for x in r1]
-                    
-                    # Create bars
-                    ax4.bar(r1, fy_data['Capital Gain'], width=barWidth, label='Capital Gain', color='skyblue')
-                    ax4.bar(r2, fy_data['Tax on CG'], width=barWidth, label='Tax on CG', color='lightcoral')
-                    
-                    # Add labels and title
-                    ax4.set_xlabel('Financial Year')
-                    ax4.set_ylabel('Amount ($)')
-                    ax4.set_title('Capital Gains vs Tax by Financial Year')
-                    ax4.set_xticks([r + barWidth/2 for r in range(len(fy_data))])
-                    ax4.set_xticklabels(fy_data['Financial Year'])
-                    
-                    # Add value labels on top of bars
-                    for i, v in enumerate(fy_data['Capital Gain']):
-                        ax4.text(i, v + 0.1, f"${v:,.2f}", ha='center', fontsize=8)
-                    
-                    for i, v in enumerate(fy_data['Tax on CG']):
-                        ax4.text(i + barWidth, v + 0.1, f"${v:,.2f}", ha='center', fontsize=8)
-                    
-                    # Add legend
-                    ax4.legend()
-                    
-                    st.pyplot(fig4)
-                else:
-                    st.info("Financial Year data not available. Please ensure your data includes dates.")
-        
-        # Export to Excel
-        rsu_sales_buffer = BytesIO()
-        with pd.ExcelWriter(rsu_sales_buffer, engine='openpyxl') as writer:
-            sell_data.to_excel(writer, index=False, sheet_name="RSU Sales")
-        rsu_sales_buffer.seek(0)
-        
-        st.download_button("📥 Download RSU Sales (Excel)",
-                          data=rsu_sales_buffer,
-                          file_name="rsu_sales.xlsx",
-                          mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-        
-        # Add button to clear all data
-        if st.button("🗑️ Clear All Sales Data"):
-            if st.session_state.get("confirm_clear_sales", False):
-                # Create an empty DataFrame with the proper structure
-                empty_sales_df = pd.DataFrame({
-                    "Sell Date": pd.Series(dtype='datetime64[ns]'),
-                    "Shares Sold": pd.Series(dtype='float64'),
-                    "Sale Price": pd.Series(dtype='float64'),
-                    "FMV at Vesting": pd.Series(dtype='float64'),
-                    "Held > 12 Months": pd.Series(dtype='bool'),
-                    "Marginal Tax Rate": pd.Series(dtype='float64'),
-                    "Gross Value": pd.Series(dtype='float64'),
-                    "Capital Gain": pd.Series(dtype='float64'),
-                    "Tax on CG": pd.Series(dtype='float64'),
-                    "Net Proceeds": pd.Series(dtype='float64')
-                })
-                # Process the empty DataFrame to ensure it has all required columns
-                empty_sales_df = tax_engine.process_sales_data(empty_sales_df, tax_rate)
-                st.session_state["sales_data"] = empty_sales_df
+                # Force rerun to update the UI immediately with recalculated values
                 st.rerun()
-            else:
-                st.session_state["confirm_clear_sales"] = True
-                st.warning("Click again to confirm clearing all sales data.")
-    else:
-        # Create an empty DataFrame with the necessary columns for sales data
-        empty_sales_df = pd.DataFrame({
-            "Sell Date": pd.Series(dtype='datetime64[ns]'),
-            "Shares Sold": pd.Series(dtype='float64'),
-            "Sale Price": pd.Series(dtype='float64'),
-            "FMV at Vesting": pd.Series(dtype='float64'),
-            "Held > 12 Months": pd.Series(dtype='bool'),
-            "Marginal Tax Rate": pd.Series(dtype='float64'),
-            "Gross Value": pd.Series(dtype='float64'),
-            "Capital Gain": pd.Series(dtype='float64'),
-            "Tax on CG": pd.Series(dtype='float64'),
-            "Net Proceeds": pd.Series(dtype='float64')
-        })
-        
-        # Process the empty DataFrame to ensure it has all required columns
-        empty_sales_df = tax_engine.process_sales_data(empty_sales_df, tax_rate)
-        
-        # Display an editable data grid even when no data is available
-        st.info("No sales data available. You can add entries directly in the grid below.")
-        
-        # Display formatted data (editable)
-        edited_sell_data = st.data_editor(
-            empty_sales_df.style.format({
-                "Capital Gain": "${:,.2f}",
-                "Tax on CG": "${:,.2f}",
-                "Net Proceeds": "${:,.2f}",
-                "Marginal Tax Rate": "{:.1f}%"
-            }),
-            num_rows="dynamic",
-            use_container_width=True,
-            hide_index=True,
-            key="sales_data_editor_empty",
-            column_config={
-                "Sell Date": st.column_config.DateColumn(
-                    "Sell Date",
-                    help="Date when RSUs were sold",
-                    format="YYYY-MM-DD",
-                    step=1,
-                ),
-                "Held > 12 Months": st.column_config.CheckboxColumn(
-                    "Held > 12 Months",
-                    help="Check if shares were held for more than 12 months (for CGT discount)",
-                ),
-            }
-        )
-        
-        # Process the edited data only if it has changed and is not empty
-        if edited_sell_data is not None and not edited_sell_data.empty and not edited_sell_data.equals(empty_sales_df):
-            # Process the edited data with tax engine
-            processed_sell_data = tax_engine.process_sales_data(edited_sell_data, tax_rate)
-            st.session_state["sales_data"] = processed_sell_data
-            
-            # Force rerun to update the UI immediately with recalculated values
-            st.rerun()
 
 # -------- TAB 3: SUMMARY --------
 with tab3:
-    st.subheader("📊 Summary")
-
-    if 'schedule' in locals() and not schedule.empty:
-        total_gross = schedule["Gross Value"].sum()
-        total_tax = schedule["Tax Payable"].sum()
-        total_net = schedule["Net Value"].sum()
+    if tab3.open:
+        st.subheader("📊 Summary")
 
-        # Create columns for displaying totals in a single row
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Gross Value", f"${total_gross:,.2f}")
-        with col2:
-            st.metric("Total Tax Payable", f"${total_tax:,.2f}")
-        with col3:
-            st.metric("Total Net Value", f"${total_net:,.2f}")
+        vesting_totals = None
+        if schedule is not None and not schedule.empty:
+            total_gross, total_tax, total_net = _column_totals(schedule, ("Gross Value", "Tax Payable", "Net Value"))
+        
+            # Display totals in a single row
+            _metric_row({
+                "Total Gross Value": total_gross,
+                "Total Tax Payable": total_tax,
+                "Total Net Value": total_net,
+            })
+            vesting_totals = (total_gross, total_tax, total_net)
 
-        # Group by Financial Year
-        grouped_fy = schedule.groupby("Financial Year")[["Gross Value", "Tax Payable", "Net Value"]].sum().reset_index()
-        st.markdown("### 📅 Financial Year-wise Tax Summary")
-        st.dataframe(grouped_fy.style.format({
-            "Gross Value": "${:,.2f}",
-            "Tax Payable": "${:,.2f}",
-            "Net Value": "${:,.2f}"
-        }))
-    else:
-        st.info("No vesting data available. Please upload or load sample vesting data to see summary.")
+            # Group by Financial Year
+            grouped_fy = _summarize_fy(schedule, ("Gross Value", "Tax Payable", "Net Value"))
+            st.markdown("### 📅 Financial Year-wise Tax Summary")
+            st.dataframe(grouped_fy, column_config={
+                "Gross Value": st.column_config.NumberColumn(format="dollar"),
+                "Tax Payable": st.column_config.NumberColumn(format="dollar"),
+                "Net Value": st.column_config.NumberColumn(format="dollar")
+            })
+        else:
+            st.info("No vesting data available. Please upload or load sample vesting data to see summary.")
 
-    if 'sell_data' in locals() and not sell_data.empty:
-        total_gain = sell_data["Capital Gain"].sum()
-        total_cgt_tax = sell_data["Tax on CG"].sum()
-        total_net_sale = sell_data["Net Proceeds"].sum()
+        if sell_data is not None and not sell_data.empty:
+            total_gain, total_cgt_tax, total_net_sale = _column_totals(sell_data, ("Capital Gain", "Tax on CG", "Net Proceeds"))
 
-        st.markdown("### 💰 Capital Gains Summary")
-        # Create columns for displaying capital gains totals in a single row
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Capital Gains", f"${total_gain:,.2f}")
-        with col2:
-            st.metric("Tax on Capital Gains", f"${total_cgt_tax:,.2f}")
-        with col3:
-            st.metric("Net Proceeds from RSU Sales", f"${total_net_sale:,.2f}")
+            st.markdown("### 💰 Capital Gains Summary")
+            # Display capital gains totals in a single row
+            _metric_row({
+                "Total Capital Gains": total_gain,
+                "Tax on Capital Gains": total_cgt_tax,
+                "Net Proceeds from RSU Sales": total_net_sale,
+            })
         
-        # Group by Financial Year
-        if "Financial Year" in sell_data.columns:
-            grouped_cg_fy = sell_data.groupby("Financial Year")[["Capital Gain", "Tax on CG", "Net Proceeds"]].sum().reset_index()
-            st.markdown("### 📅 Financial Year-wise Capital Gain Summary")
-            st.dataframe(grouped_cg_fy.style.format({
-                "Capital Gain": "${:,.2f}",
-                "Tax on CG": "${:,.2f}",
-                "Net Proceeds": "${:,.2f}"
-            }))
-
-        if st.button("� Export Summary to PDF"):
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-            pdf.cell(200, 10, txt="RSU Management Summary", ln=True, align="C")
-            pdf.ln(10)
-            pdf.cell(200, 10, txt=f"Company: {company}", ln=True)
-            
-            # Add Financial Year-wise Capital Gain Summary to PDF if available
-            if "Financial Year" in sell_data.columns and not grouped_cg_fy.empty:
-                pdf.ln(5)
-                pdf.cell(200, 10, txt="Financial Year-wise Capital Gain Summary:", ln=True)
-                for _, row in grouped_cg_fy.iterrows():
-                    pdf.cell(200, 10, txt=f"FY {row['Financial Year']}: Capital Gain ${row['Capital Gain']:,.2f}, Tax ${row['Tax on CG']:,.2f}, Net ${row['Net Proceeds']:,.2f}", ln=True)
-            pdf.cell(200, 10, txt=f"Total Gross Value: ${total_gross:,.2f}", ln=True)
-            pdf.cell(200, 10, txt=f"Total Tax Payable: ${total_tax:,.2f}", ln=True)
-            pdf.cell(200, 10, txt=f"Total Net Value: ${total_net:,.2f}", ln=True)
-            pdf.ln(5)
-            pdf.cell(200, 10, txt="Capital Gains Summary:", ln=True)
-            pdf.cell(200, 10, txt=f"Total Capital Gains: ${total_gain:,.2f}", ln=True)
-            pdf.cell(200, 10, txt=f"Tax on Capital Gains: ${total_cgt_tax:,.2f}", ln=True)
-            pdf.cell(200, 10, txt=f"Net Proceeds: ${total_net_sale:,.2f}", ln=True)
+            # Group by Financial Year
+            if "Financial Year" in sell_data.columns:
+                grouped_cg_fy = _summarize_fy(sell_data, ("Capital Gain", "Tax on CG", "Net Proceeds"))
+                st.markdown("### 📅 Financial Year-wise Capital Gain Summary")
+                st.dataframe(grouped_cg_fy, column_config={
+                    "Capital Gain": st.column_config.NumberColumn(format="dollar"),
+                    "Tax on CG": st.column_config.NumberColumn(format="dollar"),
+                    "Net Proceeds": st.column_config.NumberColumn(format="dollar")
+                })
 
-            pdf_output = pdf.output(dest='S').encode('latin1')
-            buffer = BytesIO(pdf_output)
-            st.download_button("📥 Download PDF Summary", data=buffer, file_name="rsu_summary.pdf", mime="application/pdf")
-    elif 'schedule' in locals() and not schedule.empty:
-        st.info("No sales data available. Please upload or load sample sales data to see capital gains summary.")
+            # Assemble the PDF only when the user actually clicks download
+            summary_pdf = partial(
+                _summary_pdf, company, vesting_totals, (total_gain, total_cgt_tax, total_net_sale),
+                grouped_cg_fy if "Financial Year" in sell_data.columns else None
+            )
+            st.download_button("� Export Summary to PDF", data=summary_pdf, file_name="rsu_summary.pdf", mime="application/pdf")
+        elif schedule is not None and not schedule.empty:
+            st.info("No sales data available. Please upload or load sample sales data to see capital gains summary.")
 
 # -------- TAB 4: TAX RETURN ASSISTANT --------
 with tab4:
-    st.subheader("📝 EOY Tax Return Assistant")
+    if tab4.open:
+        st.subheader("📝 EOY Tax Return Assistant")
     
-    # Financial year selection
-    available_years = []
+        # Financial year selection
+        year_columns = []
     
-    # Get available financial years from vesting and sales data
-    if 'schedule' in locals() and not schedule.empty:
-        if "Financial Year" in schedule.columns:
-            schedule_years = schedule["Financial Year"].unique().tolist()
-            available_years.extend(schedule_years)
+        # Get available financial years from vesting and sales data
+        if schedule is not None and not schedule.empty:
+            if "Financial Year" in schedule.columns:
+                year_columns.append(schedule["Financial Year"].dropna().to_numpy(dtype=str))
     
-    if 'sell_data' in locals() and not sell_data.empty:
-        # Ensure Financial Year column exists in sell_data
-        if "Financial Year" not in sell_data.columns and "Sell Date" in sell_data.columns:
-            # Use the tax_engine function for consistency
-            sell_data["Financial Year"] = sell_data["Sell Date"].apply(
-                lambda x: tax_engine.determine_financial_year(x) if pd.notnull(x) else "Unknown"
-            )
+        if sell_data is not None and not sell_data.empty:
+            # Ensure Financial Year column exists in sell_data
+            if "Financial Year" not in sell_data.columns and "Sell Date" in sell_data.columns:
+                # Use the tax_engine function for consistency
+                sell_data["Financial Year"] = tax_engine.determine_financial_years(sell_data["Sell Date"])
         
-        if "Financial Year" in sell_data.columns:
-            sales_years = sell_data["Financial Year"].unique().tolist()
-            available_years.extend(sales_years)
+            if "Financial Year" in sell_data.columns:
+                year_columns.append(sell_data["Financial Year"].dropna().to_numpy(dtype=str))
+    
+        # Remove duplicates and sort in one pass (None values were dropped above)
+        available_years = np.unique(np.concatenate(year_columns)).tolist() if year_columns else []
     
-    # Remove duplicates and sort (filter out None values)
-    available_years = [year for year in available_years if year is not None]
-    if available_years:
-        available_years = sorted(list(set(available_years)))
-    else:
-        available_years = []
+        if not available_years:
+            available_years = [f"{datetime.date.today().year-1}-{datetime.date.today().year}"]
     
-    if not available_years:
-        available_years = [f"{datetime.date.today().year-1}-{datetime.date.today().year}"]
+        selected_year = st.selectbox("Select Financial Year", available_years, index=0)
     
-    selected_year = st.selectbox("Select Financial Year", available_years, index=0)
+        # Set once both vesting and sales data are available
+        tax_summary = None
     
-    # Create columns for layout
-    col1, col2 = st.columns([2, 1])
+        # Create columns for layout
+        col1, col2 = st.columns([2, 1])
     
-    with col1:
-        st.markdown("### 📊 Income Summary")
+        with col1:
+            st.markdown("### 📊 Income Summary")
         
-        # Generate tax summary for selected year
-        if 'schedule' in locals() and 'sell_data' in locals():
-            # Generate simplified financial year summary
-            tax_summary = tax_engine.generate_financial_year_summary(
-                schedule,
-                sell_data,
-                selected_year,
-                other_income=0.0,
-                has_private_health=False,
-                family=False,
-                has_help_debt=False
-            )
-            
-            # Display income summary (RSU-focused)
-            income_data = {
-                "Category": ["RSU Vesting Income", "Capital Gains", "CGT Discount Applied", "Net Capital Gain", "Total Taxable Income"],
-                "Amount": [
-                    tax_summary.ordinary_income,
-                    tax_summary.capital_gains,
-                    -tax_summary.cgt_discount,  # Negative as it's a reduction
-                    tax_summary.net_capital_gain,
-                    tax_summary.calculate_total_income()
-                ]
-            }
+            # Generate tax summary for selected year
+            if schedule is not None and sell_data is not None:
+                # Generate simplified financial year summary
+                tax_summary = _fy_tax_summary(schedule, sell_data, selected_year)
             
-            income_df = pd.DataFrame(income_data)
-            st.dataframe(income_df.style.format({
-                "Amount": "${:,.2f}"
-            }), use_container_width=True)
-            
-            st.markdown("### 💰 Tax Summary")
+                # Display income summary (RSU-focused)
+                income_df = pd.DataFrame({
+                    "Category": INCOME_CATEGORIES,
+                    "Amount": np.array([
+                        tax_summary.ordinary_income,
+                        tax_summary.capital_gains,
+                        -tax_summary.cgt_discount,  # Negative as it's a reduction
+                        tax_summary.net_capital_gain,
+                        tax_summary.calculate_total_income()
+                    ], dtype=np.float64)
+                })
+                st.dataframe(income_df, column_config={
+                    "Amount": st.column_config.NumberColumn(format="dollar")
+                }, use_container_width=True)
             
-            # Display simplified tax summary
-            tax_data = {
-                "Category": [
-                    "Estimated Tax on Income",
-                    "Tax Already Withheld",
-                    "Remaining Tax Payable"
-                ],
-                "Amount": [
-                    tax_summary.estimated_tax,
-                    -tax_summary.tax_withheld,  # Negative as it reduces payable
-                    tax_summary.get_remaining_tax_payable()
-                ]
-            }
+                st.markdown("### 💰 Tax Summary")
             
-            tax_df = pd.DataFrame(tax_data)
-            st.dataframe(tax_df.style.format({
-                "Amount": "${:,.2f}"
-            }), use_container_width=True)
-        else:
-            st.info("Please load or enter RSU vesting and sales data to generate tax summaries.")
+                # Display simplified tax summary
+                tax_df = pd.DataFrame({
+                    "Category": TAX_CATEGORIES,
+                    "Amount": np.array([
+                        tax_summary.estimated_tax,
+                        -tax_summary.tax_withheld,  # Negative as it reduces payable
+                        tax_summary.get_remaining_tax_payable()
+                    ], dtype=np.float64)
+                })
+                st.dataframe(tax_df, column_config={
+                    "Amount": st.column_config.NumberColumn(format="dollar")
+                }, use_container_width=True)
+            else:
+                st.info("Please load or enter RSU vesting and sales data to generate tax summaries.")
     
-    with col2:
-        st.markdown("### 📝 ATO Tax Return Information")
+        with col2:
+            st.markdown("### 📝 ATO Tax Return Information")
         
-        if 'tax_summary' in locals():
-            # Map to ATO items
-            ato_items = tax_summary.map_to_ato_items()
+            if tax_summary is not None:
+                # Map to ATO items
+                ato_items = tax_summary.map_to_ato_items()
+            
+                # Only non-zero items are shown, on screen and in the ATO PDF
+                ato_nonzero = {code: amount for code, amount in ato_items.items() if amount > 0}
             
-            # Display ATO item codes
-            for code, amount in ato_items.items():
-                if amount > 0:  # Only show non-zero items
+                # Display ATO item codes
+                for code, amount in ato_nonzero.items():
                     st.write(f"**{code}:** ${amount:,.2f}")
             
-            st.markdown("### 📋 Tax Return Checklist")
+                st.markdown("### 📋 Tax Return Checklist")
             
-            # Create a simplified checklist of documents needed
-            documents = [
-                "Employee Payment Summary",
-                "Employee Share Scheme (ESS) Statement",
-                "Share Sale Contract Notes"
-            ]
+                # Create a simplified checklist of documents needed
+                documents = [
+                    "Employee Payment Summary",
+                    "Employee Share Scheme (ESS) Statement",
+                    "Share Sale Contract Notes"
+                ]
             
-            for doc in documents:
-                st.checkbox(doc, key=f"doc_{doc}")
-        else:
-            st.info("Tax return information will appear here once data is loaded.")
+                # Ticks are batched in a form so each one doesn't rerun the whole script
+                with st.form("tax_checklist", border=False):
+                    for doc in documents:
+                        st.checkbox(doc, key=f"doc_{doc}")
+                    st.form_submit_button("💾 Save Checklist")
+            else:
+                st.info("Tax return information will appear here once data is loaded.")
     
-    # Export options
-    if 'tax_summary' in locals():
-        st.markdown("### 📥 Export Options")
+        # Export options
+        if tax_summary is not None:
+            st.markdown("### 📥 Export Options")
         
-        col1, col2, col3 = st.columns(3)
+            col1, col2, col3 = st.columns(3)
         
-        with col1:
-            if st.button("📊 Export Tax Summary (Excel)"):
-                # Create Excel with tax summary
-                tax_buffer = BytesIO()
-                with pd.ExcelWriter(tax_buffer, engine='openpyxl') as writer:
-                    # Income sheet
-                    income_df.to_excel(writer, index=False, sheet_name="Income Summary")
-                    
-                    # Tax sheet
-                    tax_df.to_excel(writer, index=False, sheet_name="Tax Summary")
-                    
-                    # ATO Items sheet
-                    ato_df = pd.DataFrame({
-                        "Item Code": list(ato_items.keys()),
-                        "Amount": list(ato_items.values())
-                    })
-                    ato_df.to_excel(writer, index=False, sheet_name="ATO Items")
-                    
-                tax_buffer.seek(0)
-                
+            with col1:
                 st.download_button(
-                    "📥 Download Tax Summary",
-                    data=tax_buffer,
+                    "📊 Export Tax Summary (Excel)",
+                    data=partial(_tax_summary_excel, income_df, tax_df, ato_items),
                     file_name=f"tax_summary_{selected_year}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                 )
         
-        with col2:
-            if st.button("📄 Export ATO Format (PDF)"):
-                # Create PDF with ATO format
-                pdf = FPDF()
-                pdf.add_page()
-                pdf.set_font("Arial", size=12)
-                pdf.cell(200, 10, txt=f"Tax Return Summary - {selected_year}", ln=True, align="C")
-                pdf.ln(10)
-                
-                # Company and personal info
-                pdf.cell(200, 10, txt=f"Company: {company}", ln=True)
-                pdf.cell(200, 10, txt=f"Tax Residency: {tax_residency}", ln=True)
-                pdf.ln(5)
-                
-                # ATO Items
-                pdf.set_font("Arial", 'B', size=12)
-                pdf.cell(200, 10, txt="ATO Tax Return Items:", ln=True)
-                pdf.set_font("Arial", size=12)
-                
-                for code, amount in ato_items.items():
-                    if amount > 0:  # Only show non-zero items
-                        pdf.cell(200, 10, txt=f"{code}: ${amount:,.2f}", ln=True)
-                
-                pdf_output = pdf.output(dest='S').encode('latin1')
-                buffer = BytesIO(pdf_output)
-                
+            with col2:
                 st.download_button(
-                    "📥 Download ATO Format",
-                    data=buffer,
+                    "📄 Export ATO Format (PDF)",
+                    data=partial(_ato_pdf, selected_year, company, tax_residency, ato_nonzero),
                     file_name=f"ato_tax_return_{selected_year}.pdf",
                     mime="application/pdf"
                 )
         
-        with col3:
-            if st.button("📋 Export Tax Documentation Checklist"):
-                # Create PDF with checklist
-                pdf = FPDF()
-                pdf.add_page()
-                pdf.set_font("Arial", size=12)
-                pdf.cell(200, 10, txt="RSU Tax Documentation Checklist", ln=True, align="C")
-                pdf.ln(10)
-                
-                # Checklist items
-                pdf.set_font("Arial", 'B', size=12)
-                pdf.cell(200, 10, txt="Required Documents:", ln=True)
-                pdf.set_font("Arial", size=12)
-                
-                for doc in documents:
-                    pdf.cell(200, 10, txt=f"□ {doc}", ln=True)
-                
-                pdf.ln(5)
-                pdf.cell(200, 10, txt="Notes:", ln=True)
-                pdf.ln(20)  # Space for notes
-                
-                # Tax deadlines
-                pdf.set_font("Arial", 'B', size=12)
-                pdf.cell(200, 10, txt="Important Tax Deadlines:", ln=True)
-                pdf.set_font("Arial", size=12)
-                pdf.cell(200, 10, txt=f"• Individual Tax Return Due: 31 October {selected_year.split('-')[1]}", ln=True)
-                
-                pdf_output = pdf.output(dest='S').encode('latin1')
-                buffer = BytesIO(pdf_output)
-                
+            with col3:
                 st.download_button(
-                    "📥 Download Checklist",
-                    data=buffer,
+                    "📋 Export Tax Documentation Checklist",
+                    data=partial(_checklist_pdf, selected_year, documents),
                     file_name="tax_documentation_checklist.pdf",
                     mime="application/pdf"
                 )
 
 # -------- TAB 5: OPTIMIZATION --------
 with tab5:
-    st.subheader("💡 Tax Optimization Engine")
-    st.info("Tax Optimization Engine will be implemented in the next phase.")
+    if tab5.open:
+        st.subheader("💡 Tax Optimization Engine")
+        st.info("Tax Optimization Engine will be implemented in the next phase.")
@@ -5,11 +5,19 @@ This module provides tax calculation functions for Australian tax specifics
 related to Restricted Stock Units (RSUs).
 """
 
+import bisect
+import logging
+import re
+import numpy as np
 import pandas as pd
 import datetime
+from dataclasses import dataclass, field
 from typing import Dict, List, Tuple, Optional, Union
 
 
+logger = logging.getLogger(__name__)
+
+
 # Australian Tax Brackets (FY 2024-25)
 TAX_BRACKETS = {
     "2024-25": [
@@ -24,6 +32,31 @@ TAX_BRACKETS = {
 # Simplified tax configuration - removed Medicare and HELP/HECS
 
 
+def _bracket_table(brackets: List[Dict[str, float]]) -> Tuple[List[float], List[float], List[float]]:
+    """
+    Flatten a bracket list into parallel lists for lookup
+    
+    Args:
+        brackets: Brackets in ascending threshold order
+        
+    Returns:
+        Tuple of (thresholds, rates, tax payable at each threshold)
+    """
+    thresholds = [float(bracket["threshold"]) for bracket in brackets]
+    rates = [float(bracket["rate"]) for bracket in brackets]
+    
+    # Tax on every lower bracket in full, accumulated in bracket order
+    base_tax = [0.0]
+    for i in range(1, len(brackets)):
+        base_tax.append(base_tax[-1] + (thresholds[i] - thresholds[i - 1]) * rates[i - 1])
+    
+    return thresholds, rates, base_tax
+
+
+# Bracket lookup tables, built once per year at import
+BRACKET_TABLES = {year: _bracket_table(brackets) for year, brackets in TAX_BRACKETS.items()}
+
+
 def calculate_income_tax(income: float, year: str = "2024-25") -> float:
     """
     Calculate income tax based on progressive tax rates
@@ -35,21 +68,16 @@ def calculate_income_tax(income: float, year: str = "2024-25") -> float:
     Returns:
         Calculated tax amount
     """
-    brackets = TAX_BRACKETS.get(year, TAX_BRACKETS["2024-25"])
-    tax = 0.0
+    thresholds, rates, base_tax = BRACKET_TABLES.get(year, BRACKET_TABLES["2024-25"])
     
-    for i, bracket in enumerate(brackets):
-        if i < len(brackets) - 1:
-            next_threshold = brackets[i + 1]["threshold"]
-            if income > bracket["threshold"]:
-                taxable_in_bracket = min(income, next_threshold) - bracket["threshold"]
-                tax += taxable_in_bracket * bracket["rate"]
-        else:
-            # Highest bracket
-            if income > bracket["threshold"]:
-                tax += (income - bracket["threshold"]) * bracket["rate"]
+    # Nothing is payable at or below the first threshold (also catches NaN)
+    if not income > thresholds[0]:
+        return 0.0
     
-    return tax
+    # Tax on the lower brackets plus the marginal rate on the part above
+    # the threshold of the bracket the income falls in
+    i = bisect.bisect_right(thresholds, income) - 1
+    return base_tax[i] + (income - thresholds[i]) * rates[i]
 
 
 # Removed Medicare and HELP/HECS calculation functions
@@ -86,13 +114,13 @@ def calculate_capital_gain(
 
 def determine_financial_year(date: datetime.date) -> str:
     """
-    Convert a date to Australian financial year format (e.g., '2024-25')
+    Convert a date to Australian financial year format (e.g., '2024-2025')
     
     Args:
         date: Date to convert
         
     Returns:
-        Financial year string in format 'YYYY-YY'
+        Financial year string in format 'YYYY-YYYY'
     """
     if date.month >= 7:  # July to December
         return f"{date.year}-{date.year + 1}"
@@ -100,6 +128,66 @@ def determine_financial_year(date: datetime.date) -> str:
         return f"{date.year - 1}-{date.year}"
 
 
+def _wall_time(value) -> pd.Timestamp:
+    """Parse a single date, dropping any UTC offset but keeping its local wall time"""
+    ts = pd.to_datetime(value, errors='coerce')
+    if ts is not pd.NaT and ts.tzinfo is not None:
+        ts = ts.tz_localize(None)
+    return ts
+
+
+def determine_financial_years(dates: pd.Series) -> pd.Series:
+    """
+    Vectorized version of determine_financial_year for a column of dates
+    
+    Args:
+        dates: Series of dates (missing or unparseable dates become "Unknown")
+        
+    Returns:
+        Categorical Series of financial year labels in format 'YYYY-YYYY'
+    """
+    try:
+        parsed = pd.to_datetime(dates, errors='coerce')
+    except ValueError:
+        # Mixed UTC offsets cannot share one dtype, so parse entry by entry
+        parsed = pd.to_datetime(dates.map(_wall_time))
+    
+    # Timezone-aware dates count in their local wall time
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_localize(None)
+    
+    # Aware dates next to naive ones come back missing from the column parse;
+    # retry those entries one by one and report anything still unreadable
+    lost = parsed.isna() & dates.notna()
+    if lost.any():
+        parsed = parsed.mask(lost, pd.to_datetime(dates[lost].map(_wall_time)))
+        unparsed = int((parsed.isna() & dates.notna()).sum())
+        if unparsed:
+            logger.warning("%d date(s) could not be parsed and were marked Unknown", unparsed)
+    dates = parsed
+    
+    # Integer arithmetic on the packed datetime64 values, no per-row Timestamps.
+    # Keep the native unit: forcing nanoseconds wraps dates outside 1677-2262
+    values = dates.to_numpy()
+    valid = ~np.isnat(values)
+    month_keys = values.astype("datetime64[M]").astype(np.int64)  # months since Jan 1970
+    
+    # FY starts in July, so shifting back six months lands every date in the
+    # calendar year its FY began: one floor division bins all rows
+    start = (month_keys - 6) // 12 + 1970
+    
+    # Only a handful of distinct years, so format each label once and store
+    # the rows as categorical codes (sorted, with "Unknown" last)
+    start_years, valid_codes = np.unique(start[valid], return_inverse=True)
+    categories = [f"{year}-{year + 1}" for year in start_years]
+    codes = np.full(len(values), len(categories), dtype=np.int64)
+    codes[valid] = valid_codes
+    if not valid.all():
+        categories.append("Unknown")
+    
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=dates.index)
+
+
 def calculate_days_to_next_fy(date: datetime.date) -> int:
     """
     Calculate days until the next financial year starts
@@ -136,18 +224,18 @@ def is_long_term_holding(purchase_date: datetime.date, sale_date: datetime.date)
     return days_held > 365
 
 
+@dataclass
 class FinancialYearTaxSummary:
     """Class to store and calculate tax summary for a financial year"""
     
-    def __init__(self, year: str):
-        self.financial_year = year
-        self.ordinary_income = 0.0  # RSU vesting income
-        self.capital_gains = 0.0    # Total capital gains
-        self.cgt_discount = 0.0     # CGT discount applied
-        self.net_capital_gain = 0.0  # After discount
-        self.tax_withheld = 0.0     # Tax already withheld
-        self.estimated_tax = 0.0    # Total estimated tax
-        self.ato_item_codes = {}    # Mapping to ATO tax return items
+    financial_year: str
+    ordinary_income: float = 0.0   # RSU vesting income
+    capital_gains: float = 0.0     # Total capital gains
+    cgt_discount: float = 0.0      # CGT discount applied
+    net_capital_gain: float = 0.0  # After discount
+    tax_withheld: float = 0.0      # Tax already withheld
+    estimated_tax: float = 0.0     # Total estimated tax
+    ato_item_codes: Dict[str, float] = field(default_factory=dict)  # Mapping to ATO tax return items
     
     def calculate_total_income(self) -> float:
         """Calculate total taxable income"""
@@ -178,6 +266,90 @@ class FinancialYearTaxSummary:
         return self.get_total_tax_liability() - self.tax_withheld
 
 
+def _today() -> pd.Timestamp:
+    """Today's date as a midnight Timestamp, the default for missing date columns"""
+    return pd.Timestamp.today().normalize()
+
+
+# Accepted spellings of the input columns, preferred name first
+_VESTING_DATE_ALIASES = ("Vested Date", "Vesting Date")
+_RSU_ALIASES = ("RSU Vested", "RSUs Vested")
+_VESTING_PRICE_ALIASES = ("Price at Vesting", "FMV at Vesting")
+_GROSS_VALUE_ALIASES = ("GrossValue", "Gross Value (AUD)")
+_COST_BASE_ALIASES = ("FMV at Vesting", "Price at Vesting")
+_SHARES_SOLD_ALIASES = ("Shares Sold", "RSUs Sold")
+_SALE_PRICE_ALIASES = ("Sale Price", "Selling Price")
+
+# Any column mentioning a date or sell is taken as the sale date
+_SALES_DATE_RE = re.compile(r"date|sell", re.IGNORECASE)
+
+
+def _find_column(df: pd.DataFrame, aliases: Tuple[str, ...]) -> Optional[str]:
+    """
+    Return the first of the given column names present in the DataFrame
+    
+    Args:
+        df: DataFrame to search
+        aliases: Candidate column names in order of preference
+        
+    Returns:
+        Matching column name, or None if none are present
+    """
+    return next((alias for alias in aliases if alias in df.columns), None)
+
+
+def _standardize_column(df: pd.DataFrame, aliases: Tuple[str, ...], default: float) -> str:
+    """
+    Make sure the preferred column name exists, copying from an alias if needed
+    
+    Args:
+        df: DataFrame to update in place
+        aliases: Candidate column names, the standard name first
+        default: Value to fill when no alias is present
+        
+    Returns:
+        The standard column name
+    """
+    standard = aliases[0]
+    column = _find_column(df, aliases)
+    if column is None:
+        df[standard] = default
+    elif column != standard:
+        df[standard] = df[column]
+    return standard
+
+
+def _downcast_float_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Store float columns as float32 where that loses no precision
+    
+    A column is only downcast when every value round-trips exactly, so cent
+    amounts that float32 can't represent stay float64 (pandas' own downcast
+    accepts values that are merely close). Callers convert back to float64
+    before any further arithmetic or totals.
+    """
+    for column in columns:
+        if column in df.columns and pd.api.types.is_float_dtype(df[column]):
+            values = df[column].to_numpy(dtype=np.float64)
+            narrowed = values.astype(np.float32)
+            if np.array_equal(narrowed, values, equal_nan=True):
+                df[column] = narrowed
+    return df
+
+
+def _widen_float32_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert float32 columns back to float64 before processing
+    
+    Frames that come back from the editable grids still carry the float32
+    columns written by _downcast_float_columns. Widening is exact, and it
+    keeps edits and the arithmetic below at full precision.
+    """
+    for column in df.columns[df.dtypes == np.float32]:
+        df[column] = df[column].astype(np.float64)
+    return df
+
+
 def process_vesting_data(vesting_df: pd.DataFrame, tax_rate: float) -> pd.DataFrame:
     """
     Process RSU vesting data to include tax calculations
@@ -193,52 +365,45 @@ def process_vesting_data(vesting_df: pd.DataFrame, tax_rate: float) -> pd.DataFr
     if vesting_df.empty:
         return vesting_df
         
-    # Print column names for debugging
-    print("Columns in vesting_df:", vesting_df.columns.tolist())
+    # Work on a shallow copy so the caller's frame is left as it was; with
+    # copy-on-write the input columns are shared until they are overwritten
+    vesting_df = _widen_float32_columns(vesting_df.copy(deep=False))
+    
+    # Log column names for debugging
+    logger.debug("Columns in vesting_df: %s", list(vesting_df.columns))
     
     # Standardize column names - handle both "Vested Date" and "Vesting Date"
-    date_column = None
-    if "Vested Date" in vesting_df.columns:
-        date_column = "Vested Date"
-    elif "Vesting Date" in vesting_df.columns:
-        date_column = "Vesting Date"
-    else:
+    date_column = _find_column(vesting_df, _VESTING_DATE_ALIASES)
+    if date_column is None:
         # If no date column found, add a default one
-        vesting_df["Vesting Date"] = pd.to_datetime("today")
+        vesting_df["Vesting Date"] = _today()
         date_column = "Vesting Date"
     
     # Ensure datetime format for date column
     vesting_df[date_column] = pd.to_datetime(vesting_df[date_column], errors='coerce')
     
-    # Standardize RSU column names
-    rsu_column = None
-    if "RSU Vested" in vesting_df.columns:
-        rsu_column = "RSU Vested"
-    elif "RSUs Vested" in vesting_df.columns:
-        rsu_column = "RSUs Vested"
+    # Standardize RSU and price column names
+    rsu_column = _find_column(vesting_df, _RSU_ALIASES)
+    price_column = _find_column(vesting_df, _VESTING_PRICE_ALIASES)
+    gross_column = _find_column(vesting_df, _GROSS_VALUE_ALIASES)
     
-    # Standardize price column names
-    price_column = None
-    if "Price at Vesting" in vesting_df.columns:
-        price_column = "Price at Vesting"
-    elif "FMV at Vesting" in vesting_df.columns:
-        price_column = "FMV at Vesting"
+    # Columns computed here rather than passed through from the input
+    derived_columns = ["Tax Payable", "Net Value"]
     
     # Always recalculate Gross Value if we have the necessary columns
     if rsu_column and price_column:
-        # Print debug info
-        print(f"Recalculating Gross Value using {rsu_column} * {price_column}")
-        print(f"Sample {rsu_column} values:", vesting_df[rsu_column].head().tolist())
-        print(f"Sample {price_column} values:", vesting_df[price_column].head().tolist())
+        # Log debug info (sample values are only built when debug logging is on)
+        logger.debug("Recalculating Gross Value using %s * %s", rsu_column, price_column)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sample %s values: %s", rsu_column, vesting_df[rsu_column].head().tolist())
+            logger.debug("Sample %s values: %s", price_column, vesting_df[price_column].head().tolist())
         
         # Calculate Gross Value
         vesting_df["Gross Value"] = vesting_df[rsu_column] * vesting_df[price_column]
-    elif "GrossValue" in vesting_df.columns:
+        derived_columns.append("Gross Value")
+    elif gross_column:
         # Standardize column name
-        vesting_df["Gross Value"] = vesting_df["GrossValue"]
-    elif "Gross Value (AUD)" in vesting_df.columns:
-        # Standardize column name
-        vesting_df["Gross Value"] = vesting_df["Gross Value (AUD)"]
+        vesting_df["Gross Value"] = vesting_df[gross_column]
     elif "Gross Value" not in vesting_df.columns:
         # If we can't calculate it and it doesn't exist, add a default
         vesting_df["Gross Value"] = 0.0
@@ -247,25 +412,27 @@ def process_vesting_data(vesting_df: pd.DataFrame, tax_rate: float) -> pd.DataFr
     if "Marginal Tax Rate" not in vesting_df.columns:
         vesting_df["Marginal Tax Rate"] = tax_rate
     
+    # Coerce once so stray text from uploads or the editor becomes NaN instead
+    # of breaking the arithmetic below
+    for column in ("Gross Value", "Marginal Tax Rate"):
+        vesting_df[column] = pd.to_numeric(vesting_df[column], errors='coerce')
+    
     # Calculate tax and net value using row-specific tax rates
-    vesting_df["Tax Payable"] = vesting_df.apply(
-        lambda row: row["Gross Value"] * (row["Marginal Tax Rate"] / 100), axis=1
-    )
-    vesting_df["Net Value"] = vesting_df["Gross Value"] - vesting_df["Tax Payable"]
+    # (on the underlying float64 arrays to avoid per-row and per-Series overhead)
+    gross = vesting_df["Gross Value"].to_numpy(dtype=np.float64)
+    tax = gross * (vesting_df["Marginal Tax Rate"].to_numpy(dtype=np.float64) / 100)
+    vesting_df["Tax Payable"] = tax
+    vesting_df["Net Value"] = gross - tax
     
-    # Print calculated values for debugging
-    # print("Calculated values:")
-    # print("Gross Value:", vesting_df["Gross Value"].tolist())
-    # print("Tax Payable:", vesting_df["Tax Payable"].tolist())
-    # print("Net Value:", vesting_df["Net Value"].tolist())
+    # Log a sample of the calculated values for debugging
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Calculated values:\n%s", vesting_df[["Gross Value", "Tax Payable", "Net Value"]].head())
     
     # Calculate Financial Year
-    vesting_df["Financial Year"] = vesting_df[date_column].apply(
-        lambda x: f"{x.year}-{x.year+1}" if pd.notnull(x) and x.month >= 7 else
-                 f"{x.year-1}-{x.year}" if pd.notnull(x) else "Unknown"
-    )
+    vesting_df["Financial Year"] = determine_financial_years(vesting_df[date_column])
     
-    return vesting_df
+    # Halve the memory of the derived value columns where it is lossless
+    return _downcast_float_columns(vesting_df, derived_columns)
 
 
 def process_sales_data(sales_df: pd.DataFrame, tax_rate: float) -> pd.DataFrame:
@@ -283,19 +450,22 @@ def process_sales_data(sales_df: pd.DataFrame, tax_rate: float) -> pd.DataFrame:
     if sales_df.empty:
         return sales_df
         
-    # Print column names for debugging
-    print("Columns in sales_df:", sales_df.columns.tolist())
+    # Work on a shallow copy so the caller's frame is left as it was; with
+    # copy-on-write the input columns are shared until they are overwritten
+    sales_df = _widen_float32_columns(sales_df.copy(deep=False))
+    
+    # Log column names for debugging
+    logger.debug("Columns in sales_df: %s", list(sales_df.columns))
     
     # Check if Sell Date column exists
-    date_column = None
-    for col in sales_df.columns:
-        if "date" in col.lower() or "sell" in col.lower():
-            date_column = col
-            break
+    date_column = next(
+        (col for col in sales_df.columns if isinstance(col, str) and _SALES_DATE_RE.search(col)),
+        None
+    )
     
     if date_column is None:
         # If no date column found, add a default one
-        sales_df["Sell Date"] = pd.to_datetime("today")
+        sales_df["Sell Date"] = _today()
         date_column = "Sell Date"
     else:
         # Ensure datetime format
@@ -304,79 +474,117 @@ def process_sales_data(sales_df: pd.DataFrame, tax_rate: float) -> pd.DataFrame:
         if date_column != "Sell Date":
             sales_df["Sell Date"] = sales_df[date_column]
     
-    # Standardize price column names
-    price_column = None
-    if "FMV at Vesting" in sales_df.columns:
-        price_column = "FMV at Vesting"
-    elif "Price at Vesting" in sales_df.columns:
-        price_column = "Price at Vesting"
-        # Rename to standard name
-        sales_df["FMV at Vesting"] = sales_df[price_column]
-        price_column = "FMV at Vesting"
-    else:
-        # If missing, add a default
-        sales_df["FMV at Vesting"] = 0.0
-        price_column = "FMV at Vesting"
-    
-    # Standardize shares column
-    shares_column = None
-    if "Shares Sold" in sales_df.columns:
-        shares_column = "Shares Sold"
-    elif "RSUs Sold" in sales_df.columns:
-        shares_column = "RSUs Sold"
-        # Rename to standard name
-        sales_df["Shares Sold"] = sales_df[shares_column]
-        shares_column = "Shares Sold"
-    else:
-        # If missing, add a default
-        sales_df["Shares Sold"] = 0.0
-        shares_column = "Shares Sold"
-    
-    # Standardize sale price column
-    sale_price_column = None
-    if "Sale Price" in sales_df.columns:
-        sale_price_column = "Sale Price"
-    elif "Selling Price" in sales_df.columns:
-        sale_price_column = "Selling Price"
-        # Rename to standard name
-        sales_df["Sale Price"] = sales_df[sale_price_column]
-        sale_price_column = "Sale Price"
-    else:
-        # If missing, add a default
-        sales_df["Sale Price"] = 0.0
-        sale_price_column = "Sale Price"
+    # Standardize price, shares and sale price columns, defaulting to 0.0 if missing
+    _standardize_column(sales_df, _COST_BASE_ALIASES, 0.0)
+    _standardize_column(sales_df, _SHARES_SOLD_ALIASES, 0.0)
+    _standardize_column(sales_df, _SALE_PRICE_ALIASES, 0.0)
     
     # Check for long-term holding column
     if "Held > 12 Months" not in sales_df.columns:
         sales_df["Held > 12 Months"] = False
     
-    # Calculate Gross Value (Shares Sold * Sale Price)
-    sales_df["Gross Value"] = sales_df["Shares Sold"] * sales_df["Sale Price"]
+    # Coerce once so stray text from uploads or the editor becomes NaN instead
+    # of breaking the arithmetic below
+    for column in ("Shares Sold", "Sale Price", "FMV at Vesting"):
+        sales_df[column] = pd.to_numeric(sales_df[column], errors='coerce')
+    
+    # Pull each input out as a float64 array once and reuse it below
+    shares = sales_df["Shares Sold"].to_numpy(dtype=np.float64)
+    sale_price = sales_df["Sale Price"].to_numpy(dtype=np.float64)
+    cost_base = sales_df["FMV at Vesting"].to_numpy(dtype=np.float64)
     
-    # Calculate capital gains
-    def calculate_cgt_row(row):
-        gain = (row["Sale Price"] - row["FMV at Vesting"]) * row["Shares Sold"]
-        return gain * 0.5 if row["Held > 12 Months"] and gain > 0 else gain
+    # Calculate Gross Value (Shares Sold * Sale Price)
+    gross = shares * sale_price
+    sales_df["Gross Value"] = gross
     
     # Add Marginal Tax Rate column if it doesn't exist
     if "Marginal Tax Rate" not in sales_df.columns:
         sales_df["Marginal Tax Rate"] = tax_rate
+    sales_df["Marginal Tax Rate"] = pd.to_numeric(sales_df["Marginal Tax Rate"], errors='coerce')
     
-    sales_df["Capital Gain"] = sales_df.apply(calculate_cgt_row, axis=1)
+    # Calculate capital gains - 50% discount only applies to long-term gains
+    gain = (sale_price - cost_base) * shares
+    long_term = sales_df["Held > 12 Months"].fillna(False).to_numpy(dtype=bool)
+    capital_gain = np.where(long_term & (gain > 0), gain * 0.5, gain)
+    sales_df["Capital Gain"] = capital_gain
     
     # Calculate tax using row-specific tax rates
-    sales_df["Tax on CG"] = sales_df.apply(
-        lambda row: row["Capital Gain"] * (row["Marginal Tax Rate"] / 100), axis=1
-    )
-    sales_df["Net Proceeds"] = sales_df["Gross Value"] - sales_df["Tax on CG"]
+    tax_on_cg = capital_gain * (sales_df["Marginal Tax Rate"].to_numpy(dtype=np.float64) / 100)
+    sales_df["Tax on CG"] = tax_on_cg
+    sales_df["Net Proceeds"] = gross - tax_on_cg
     
     # Calculate Financial Year for sales
-    sales_df["Financial Year"] = sales_df["Sell Date"].apply(
-        lambda x: f"{x.year}-{x.year+1}" if pd.notnull(x) and x.month >= 7 else
-                 f"{x.year-1}-{x.year}" if pd.notnull(x) else "Unknown"
-    )
+    sales_df["Financial Year"] = determine_financial_years(sales_df["Sell Date"])
+    
+    # Halve the memory of the derived value columns where it is lossless
+    return _downcast_float_columns(sales_df, ["Gross Value", "Capital Gain", "Tax on CG", "Net Proceeds"])
+
+
+def summarize_by_financial_year(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Sum the given columns for each financial year
+    
+    Args:
+        df: Processed DataFrame with a "Financial Year" column
+        columns: Numeric columns to total
+        
+    Returns:
+        DataFrame with one row per financial year (sorted) and the column totals
+    """
+    # Integer group codes + bincount avoid the hash-based groupby machinery;
+    # categorical years (as produced by determine_financial_years) already carry them
+    financial_years = df["Financial Year"]
+    if isinstance(financial_years.dtype, pd.CategoricalDtype) and not financial_years.hasnans:
+        financial_years = financial_years.cat.remove_unused_categories()
+        years = financial_years.cat.categories.to_numpy(dtype=str)
+        codes = financial_years.cat.codes.to_numpy()
+    else:
+        years, codes = np.unique(financial_years.to_numpy(dtype=str), return_inverse=True)
+    summary = {"Financial Year": years}
+    for column in columns:
+        values = np.nan_to_num(df[column].to_numpy(dtype=np.float64))
+        summary[column] = np.bincount(codes, weights=values, minlength=years.size)
     
-    return sales_df
+    return pd.DataFrame(summary)
+
+
+def summarize_tax_years(
+    vesting_df: pd.DataFrame,
+    sales_df: pd.DataFrame
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Total the tax summary inputs for every financial year in one pass per frame
+    
+    Args:
+        vesting_df: DataFrame with vesting data
+        sales_df: DataFrame with sales data
+        
+    Returns:
+        Tuple of (vesting totals, sales totals), each indexed by financial year.
+        Vesting totals hold "Gross Value" and "Tax Payable", sales totals hold
+        "Capital Gain" and "CGT Discount" (the long-term share of the gain);
+        columns missing from the input are left out
+    """
+    vesting_totals = pd.DataFrame()
+    if not vesting_df.empty and "Financial Year" in vesting_df.columns:
+        columns = [column for column in ("Gross Value", "Tax Payable") if column in vesting_df.columns]
+        vesting_totals = summarize_by_financial_year(vesting_df, columns).set_index("Financial Year")
+    
+    sales_totals = pd.DataFrame()
+    if not sales_df.empty and "Financial Year" in sales_df.columns and "Capital Gain" in sales_df.columns:
+        capital_gain = sales_df["Capital Gain"].to_numpy(dtype=np.float64)
+        if "Held > 12 Months" in sales_df.columns:
+            long_term = sales_df["Held > 12 Months"].fillna(False).to_numpy(dtype=bool)
+        else:
+            long_term = np.zeros(len(sales_df), dtype=bool)
+        gains = pd.DataFrame({
+            "Financial Year": sales_df["Financial Year"],
+            "Capital Gain": capital_gain,
+            "CGT Discount": np.where(long_term, capital_gain, 0.0)
+        })
+        sales_totals = summarize_by_financial_year(gains, ["Capital Gain", "CGT Discount"]).set_index("Financial Year")
+    
+    return vesting_totals, sales_totals
 
 
 def generate_financial_year_summary(
@@ -386,7 +594,8 @@ def generate_financial_year_summary(
     other_income: float = 0.0,
     has_private_health: bool = False,
     family: bool = False,
-    has_help_debt: bool = False
+    has_help_debt: bool = False,
+    year_totals: Optional[Tuple[pd.DataFrame, pd.DataFrame]] = None
 ) -> FinancialYearTaxSummary:
     """
     Generate a tax summary for a specific financial year
@@ -399,6 +608,8 @@ def generate_financial_year_summary(
         has_private_health: Not used in simplified version (kept for backward compatibility)
         family: Not used in simplified version (kept for backward compatibility)
         has_help_debt: Not used in simplified version (kept for backward compatibility)
+        year_totals: Precomputed result of summarize_tax_years for these frames, so
+            callers summarizing several years only aggregate the data once
         
     Returns:
         FinancialYearTaxSummary object with calculated tax information
@@ -412,27 +623,22 @@ def generate_financial_year_summary(
         return summary
     
     try:
-        # Filter data for the specified financial year
-        if not vesting_df.empty and "Financial Year" in vesting_df.columns:
-            year_vesting = vesting_df[vesting_df["Financial Year"] == year]
-            # Calculate ordinary income from RSU vestings
-            if "Gross Value" in year_vesting.columns and not year_vesting.empty:
-                summary.ordinary_income = year_vesting["Gross Value"].sum()
-            
-            # Calculate tax withheld
-            if "Tax Payable" in year_vesting.columns and not year_vesting.empty:
-                summary.tax_withheld = year_vesting["Tax Payable"].sum()
+        vesting_totals, sales_totals = year_totals or summarize_tax_years(vesting_df, sales_df)
+        
+        # Calculate ordinary income from RSU vestings and tax withheld
+        if year in vesting_totals.index:
+            year_vesting = vesting_totals.loc[year]
+            summary.ordinary_income = float(year_vesting.get("Gross Value", 0.0))
+            summary.tax_withheld = float(year_vesting.get("Tax Payable", 0.0))
         
         # Calculate capital gains
-        if not sales_df.empty and "Financial Year" in sales_df.columns:
-            year_sales = sales_df[sales_df["Financial Year"] == year]
-            if "Capital Gain" in year_sales.columns and not year_sales.empty:
-                summary.capital_gains = year_sales["Capital Gain"].sum() * 2  # Before discount
-                if "Held > 12 Months" in year_sales.columns:
-                    summary.cgt_discount = year_sales[year_sales["Held > 12 Months"]]["Capital Gain"].sum()
-                summary.net_capital_gain = year_sales["Capital Gain"].sum()
+        if year in sales_totals.index:
+            year_sales = sales_totals.loc[year]
+            summary.capital_gains = float(year_sales["Capital Gain"]) * 2  # Before discount
+            summary.cgt_discount = float(year_sales["CGT Discount"])
+            summary.net_capital_gain = float(year_sales["Capital Gain"])
     except Exception as e:
-        print(f"Error generating financial year summary: {e}")
+        logger.warning("Error generating financial year summary: %s", e)
         # Continue with default values if there's an error
     
     # Calculate tax (simplified)